@@ -17,6 +17,29 @@ class ColorDetector:
         
         # 使用传入的配置或默认配置
         self.hsv_config = config.copy() if config else self.default_hsv_config.copy()
+        
+        # 阈值数组和形态学核只在初始化时构建一次，避免每帧每种颜色重复分配
+        self._morph_kernel = np.ones((5, 5), np.uint8)
+        self.build_thresholds()
+    
+    def build_thresholds(self):
+        # 根据hsv_config预先生成每种颜色的(lower, upper)区间列表，修改hsv_config后需重新调用
+        self._hsv_ranges = {}
+        for color, cfg in self.hsv_config.items():
+            lower = np.array(cfg['lower'])
+            upper = np.array(cfg['upper'])
+            
+            # 对于红色，需要特殊处理（因为红色在HSV环中跨越0点）
+            if color == 'red':
+                ranges = [(lower, np.array([10, 255, 255])),
+                          (np.array([160, lower[1], lower[2]]), np.array([180, upper[1], upper[2]]))]
+            elif color == 'purple':
+                # 对于紫色，也需要特殊处理以捕获完整的紫色范围，中间点140度作为分界
+                ranges = [(lower, np.array([140, upper[1], upper[2]])),
+                          (np.array([140, lower[1], lower[2]]), upper)]
+            else:
+                ranges = [(lower, upper)]
+            self._hsv_ranges[color] = ranges
     
     def update_thresholds_if_needed(self, frame):
         # 简化版本，不再进行光照自适应调整
@@ -33,48 +56,46 @@ class ColorDetector:
         try:
             # 转换为HSV色彩空间
             hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-            
-            # 获取该颜色的HSV阈值
-            lower = np.array(self.hsv_config[color]['lower'])
-            upper = np.array(self.hsv_config[color]['upper'])
-            
-            # 对于红色，需要特殊处理（因为红色在HSV环中跨越0点）
-            if color == 'red':
-                lower1 = lower
-                upper1 = np.array([10, 255, 255])
-                lower2 = np.array([160, lower[1], lower[2]])
-                upper2 = np.array([180, upper[1], upper[2]])
-                
-                # 创建两个掩码并合并
-                mask1 = cv2.inRange(hsv, lower1, upper1)
-                mask2 = cv2.inRange(hsv, lower2, upper2)
-                mask = cv2.bitwise_or(mask1, mask2)
-            elif color == 'purple':
-                # 对于紫色，也需要特殊处理以捕获完整的紫色范围
-                lower1 = lower
-                upper1 = np.array([140, upper[1], upper[2]])  # 中间点140度作为分界
-                lower2 = np.array([140, lower[1], lower[2]])
-                upper2 = upper
-                
-                # 创建两个掩码并合并
-                mask1 = cv2.inRange(hsv, lower1, upper1)
-                mask2 = cv2.inRange(hsv, lower2, upper2)
-                mask = cv2.bitwise_or(mask1, mask2)
-            else:
-                # 创建单一掩码
-                mask = cv2.inRange(hsv, lower, upper)
-            
-            # 形态学操作，去除噪声
-            kernel = np.ones((5, 5), np.uint8)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-            
-            return mask
+            return self._mask_from_hsv(hsv, color)
             
         except Exception as e:
 
             return None
     
+    def detect_colors(self, frame, colors):
+        # 同一帧检测多种颜色时只做一次BGR->HSV转换，各颜色共用同一张HSV图
+        self.update_thresholds_if_needed(frame)
+        
+        masks = {}
+        try:
+            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        except Exception as e:
+            return {color: None for color in colors}
+        
+        for color in colors:
+            if color not in self.hsv_config:
+                masks[color] = None
+                continue
+            try:
+                masks[color] = self._mask_from_hsv(hsv, color)
+            except Exception as e:
+                masks[color] = None
+        
+        return masks
+    
+    def _mask_from_hsv(self, hsv, color):
+        # 使用预先生成的阈值区间，多段区间的掩码合并
+        ranges = self._hsv_ranges[color]
+        mask = cv2.inRange(hsv, ranges[0][0], ranges[0][1])
+        for lower, upper in ranges[1:]:
+            mask = cv2.bitwise_or(mask, cv2.inRange(hsv, lower, upper))
+        
+        # 形态学操作，去除噪声
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self._morph_kernel)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self._morph_kernel)
+        
+        return mask
+    
     def find_contours(self, mask, min_area=50):
         # 从掩码中查找轮廓
         if mask is None:
@@ -103,10 +124,11 @@ class ColorDetector:
             colors = list(self.hsv_config.keys())
         
         detected_balls = []
+        masks = self.detect_colors(frame, colors)
         
         for color in colors:
             # 检测特定颜色
-            mask = self.detect_color(frame, color)
+            mask = masks[color]
             if mask is None:
                 continue
             
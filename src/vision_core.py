@@ -50,6 +50,9 @@ class VisionCore:
         self.color_detector = ColorDetector()
         self.ball_tracker = BallTracker()
         self.video_writer = None
+        
+        # 紫色围栏叠加层缓存，帧尺寸不变时复用，避免每帧重新分配和填充整帧图像
+        self._fence_overlay = None
     
     def init_camera(self):
         """初始化摄像头"""
@@ -80,13 +83,8 @@ class VisionCore:
         if frame is None:
             return []
         
-        balls = []
-        # 检测各颜色小球
-        for color in ['red', 'green', 'blue', 'yellow']:
-            color_balls = self.color_detector.detect_color(frame, color)
-            balls.extend(color_balls)
-        
-        return balls
+        # 检测各颜色小球（各颜色共用一次HSV转换）
+        return self.color_detector.detect_balls(frame, ['red', 'green', 'blue', 'yellow'])
     
     def calculate_ball_priority(self, ball, safety_zones=None):
         """检查小球是否有效（不在对应安全区内）"""
@@ -109,27 +107,21 @@ class VisionCore:
         """过滤无效小球，保留有效的小球"""
         # 过滤条件：有效小球需要有完整数据且不在对应安全区内
         # 过滤有效小球
+        # 检查小球是否存在且包含所有必需属性
+        required_fields = ['x', 'y', 'radius', 'color']
+        candidates = [ball for ball in balls
+                      if ball and ball.get('color') and all(field in ball for field in required_fields)]
+        
+        # 所有候选小球一次性做安全区判断，规则与calculate_ball_priority相同
+        in_safety, safety_colors = self.is_balls_in_safety_zone(candidates, safety_zones)
+        target_colors = (self.team_color, self.enemy_color)
+        
         valid_balls = []
-        for ball in balls:
-            # 检查小球是否存在
-            if not ball:
-                continue
-            
-            # 检查小球是否包含所有必需属性
-            required_fields = ['x', 'y', 'radius', 'color']
-            has_required_fields = True
-            for field in required_fields:
-                if field not in ball:
-                    has_required_fields = False
-                    break
-            
-            if not has_required_fields:
+        for ball, inside, safety_color in zip(candidates, in_safety, safety_colors):
+            # 过滤掉已在目标安全区的小球
+            if inside and safety_color and ball['color'] == safety_color and safety_color in target_colors:
                 continue
-            
-            # 检查小球是否在安全区域且符合优先级规则
-            priority = self.calculate_ball_priority(ball, safety_zones)
-            if priority != float('inf'):
-                valid_balls.append(ball)
+            valid_balls.append(ball)
         
         return valid_balls
     
@@ -139,8 +131,12 @@ class VisionCore:
         valid_balls = self.get_prioritized_balls(balls, safety_zones)
         
         # 按检测顺序查找符合黄色球限制规则的第一个小球
+        # 己方球数量对所有候选球相同，遇到第一个黄色球时统计一次后复用
+        team_ball_count = None
         for ball in valid_balls:
-            if self.check_yellow_ball_restriction(balls, ball):
+            if ball.get('color') == 'yellow' and team_ball_count is None:
+                team_ball_count = self.count_team_balls(balls)
+            if self.check_yellow_ball_restriction(balls, ball, team_ball_count):
                 return ball
                 
         return None
@@ -149,16 +145,21 @@ class VisionCore:
         """标记首次抓取已完成"""
         self.first_pick_done = True
     
-    def check_yellow_ball_restriction(self, balls, target_ball):
-        """检查黄色球限制规则"""
+    def count_team_balls(self, balls):
+        """统计场上己方球数量"""
+        return sum(1 for b in balls if b and b.get('color') == self.team_color)
+    
+    def check_yellow_ball_restriction(self, balls, target_ball, team_ball_count=None):
+        """检查黄色球限制规则，team_ball_count为已统计好的己方球数量（可选）"""
         if target_ball.get('color') != 'yellow':
             return True
         
         # 计算场上己方球数量
-        team_balls = [b for b in balls if b and b.get('color') == self.team_color]
+        if team_ball_count is None:
+            team_ball_count = self.count_team_balls(balls)
         
         # 只有当己方球少于2个时才能抓取黄色球
-        return len(team_balls) < 2
+        return team_ball_count < 2
     
     def is_ball_in_safety_zone(self, ball, safety_zones=None):
         """检查小球是否在安全区内"""
@@ -181,10 +182,51 @@ class VisionCore:
         
         return False, None
         
+    def is_balls_in_safety_zone(self, balls, safety_zones=None):
+        """批量检查多个小球是否在安全区内，结果与逐个调用is_ball_in_safety_zone一致
+        
+        先用numpy对所有小球中心做安全区外接矩形筛选，只有落在外接矩形内的小球才调用pointPolygonTest
+        
+        Returns:
+            (np.ndarray[bool], list): 每个小球是否在安全区内，以及所在安全区颜色（旧版矩形安全区为None）
+        """
+        n = len(balls)
+        in_safety = np.zeros(n, dtype=bool)
+        safety_colors = [None] * n
+        if n == 0:
+            return in_safety, safety_colors
+        
+        xy = np.array([(ball.get('x', 0), ball.get('y', 0)) if ball else (0, 0) for ball in balls])
+        xs, ys = xy[:, 0], xy[:, 1]
+        valid = np.array([bool(ball) for ball in balls])
+        zones = safety_zones or self.dynamic_safety_zones
+        
+        # 检查动态安全区（按字典顺序，先命中的颜色优先）
+        for color, zone in zones.items():
+            if not (zone and 'contour' in zone):
+                continue
+            contour = zone['contour']
+            if 'x' in zone:
+                x, y, w, h = zone['x'], zone['y'], zone['width'], zone['height']
+            else:
+                x, y, w, h = cv2.boundingRect(contour)
+            candidates = valid & ~in_safety & (xs >= x) & (xs < x + w) & (ys >= y) & (ys < y + h)
+            for i in np.flatnonzero(candidates):
+                if cv2.pointPolygonTest(contour, (float(xs[i]), float(ys[i])), False) >= 0:
+                    in_safety[i] = True
+                    safety_colors[i] = color
+        
+        # 兼容旧版矩形安全区
+        for zone in self.safety_zones:
+            if len(zone) >= 4:
+                in_safety |= valid & (xs >= zone[0]) & (xs <= zone[2]) & (ys >= zone[1]) & (ys <= zone[3])
+        
+        return in_safety, safety_colors
+    
     def detect_purple_fence(self, frame):
         """检测紫色围栏"""
         if frame is None or frame.size == 0:
-            return np.ones(frame.shape[:2], dtype=np.uint8) * 255 if frame is not None else None
+            return np.full(frame.shape[:2], 255, dtype=np.uint8) if frame is not None else None
         
         try:
             # 转换为HSV色彩空间
@@ -241,7 +283,7 @@ class VisionCore:
         except Exception as e:
             print(f"检测紫色围栏时出错: {e}")
             # 出错时返回全1的掩码，避免影响正常检测
-            return np.ones(frame.shape[:2], dtype=np.uint8) * 255
+            return np.full(frame.shape[:2], 255, dtype=np.uint8)
     
     def detect_safety_zones(self, frame):
         """动态检测红色和蓝色安全区
@@ -258,8 +300,11 @@ class VisionCore:
         safety_zones = {'red': None, 'blue': None}
         
         try:
+            # 红蓝两色共用一次HSV转换
+            masks = self.color_detector.detect_colors(frame, ('red', 'blue'))
+            
             # 检测红色安全区
-            red_mask = self.color_detector.detect_color(frame, 'red')
+            red_mask = masks['red']
             if red_mask is not None:
                 # 形态学操作，填充红色区域
                 kernel = np.ones((15, 15), np.uint8)
@@ -271,12 +316,14 @@ class VisionCore:
                 # 找到最大的红色区域作为红色安全区
                 if contours:
                     largest_contour = max(contours, key=cv2.contourArea)
-                    if cv2.contourArea(largest_contour) > 1000:  # 最小面积阈值
+                    area = cv2.contourArea(largest_contour)
+                    if area > 1000:  # 最小面积阈值
                         x, y, w, h = cv2.boundingRect(largest_contour)
-                        safety_zones['red'] = {'x': x, 'y': y, 'width': w, 'height': h, 'contour': largest_contour}
+                        safety_zones['red'] = {'x': x, 'y': y, 'width': w, 'height': h,
+                                              'area': area, 'contour': largest_contour}
             
             # 检测蓝色安全区
-            blue_mask = self.color_detector.detect_color(frame, 'blue')
+            blue_mask = masks['blue']
             if blue_mask is not None:
                 # 形态学操作，填充蓝色区域
                 kernel = np.ones((15, 15), np.uint8)
@@ -288,9 +335,11 @@ class VisionCore:
                 # 找到最大的蓝色区域作为蓝色安全区
                 if contours:
                     largest_contour = max(contours, key=cv2.contourArea)
-                    if cv2.contourArea(largest_contour) > 1000:  # 最小面积阈值
+                    area = cv2.contourArea(largest_contour)
+                    if area > 1000:  # 最小面积阈值
                         x, y, w, h = cv2.boundingRect(largest_contour)
-                        safety_zones['blue'] = {'x': x, 'y': y, 'width': w, 'height': h, 'contour': largest_contour}
+                        safety_zones['blue'] = {'x': x, 'y': y, 'width': w, 'height': h,
+                                              'area': area, 'contour': largest_contour}
             
         except Exception as e:
             print(f"检测安全区时出错: {e}")
@@ -321,12 +370,14 @@ class VisionCore:
                 center_in_valid = fence_mask[y, x] > 127
                 
                 # 方法2：检查小球大部分区域是否在可抓取区域内
-                # 创建一个小球区域的掩码
-                ball_mask = np.zeros_like(fence_mask)
-                cv2.circle(ball_mask, (x, y), r, 255, -1)
+                # 只在小球外接正方形范围内创建掩码，避免每个小球分配整帧大小的掩码
+                x0, y0 = max(x - r, 0), max(y - r, 0)
+                x1, y1 = min(x + r + 1, w), min(y + r + 1, h)
+                ball_mask = np.zeros((y1 - y0, x1 - x0), dtype=fence_mask.dtype)
+                cv2.circle(ball_mask, (x - x0, y - y0), r, 255, -1)
                 
                 # 计算小球区域中在可抓取区域内的比例
-                intersection = cv2.bitwise_and(ball_mask, fence_mask)
+                intersection = cv2.bitwise_and(ball_mask, fence_mask[y0:y1, x0:x1])
                 valid_area = cv2.countNonZero(intersection)
                 total_ball_area = cv2.countNonZero(ball_mask)
                 
@@ -350,9 +401,11 @@ class VisionCore:
             return frame
         
         try:
-            # 创建围栏掩码的彩色版本
-            fence_overlay = np.zeros_like(frame)
-            fence_overlay[:, :] = (128, 0, 128)  # 紫色
+            # 创建围栏掩码的彩色版本（按帧尺寸缓存）
+            fence_overlay = self._fence_overlay
+            if fence_overlay is None or fence_overlay.shape != frame.shape or fence_overlay.dtype != frame.dtype:
+                fence_overlay = np.full(frame.shape, (128, 0, 128), dtype=frame.dtype)  # 紫色，一次填充
+                self._fence_overlay = fence_overlay
             
             # 创建围栏区域的掩码（反转fence_mask）
             purple_mask = cv2.bitwise_not(fence_mask)
@@ -400,8 +453,8 @@ class VisionCore:
                             cx = int(M['m10'] / M['m00'])
                             cy = int(M['m01'] / M['m00'])
                             
-                            # 计算轮廓的边界矩形，用于确定标签位置
-                            x, y, w, h = cv2.boundingRect(contour)
+                            # 边界矩形在检测安全区时已经算过，直接复用，用于确定标签位置
+                            y = zone_info['y'] if 'y' in zone_info else cv2.boundingRect(contour)[1]
                             
                             # 标签位置 - 放置在安全区上方或内部，避免超出图像范围
                             label_pos = (cx - 40, max(20, y - 10))
@@ -425,7 +478,7 @@ class VisionCore:
                                        status_pos, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
                             
                             # 显示安全区面积信息
-                            area = cv2.contourArea(contour)
+                            area = zone_info['area'] if 'area' in zone_info else cv2.contourArea(contour)
                             area_text = f"Area: {int(area)}px"
                             area_pos = (cx - 40, cy + 20)
                             cv2.putText(result_frame, area_text, 
@@ -491,7 +544,7 @@ class VisionCore:
     def process_frame(self, frame):
         """处理单帧图像，集成动态安全区检测"""
         if frame is None or frame.size == 0:
-            return {"frame": None, "balls": [], "best_target": None}
+            return {"frame": None, "balls": [], "best_target": None, "fence_mask": None}
         
         # 创建图像副本
         annotated_frame = frame.copy()
@@ -553,7 +606,9 @@ class VisionCore:
             'frame': annotated_frame,
             'balls': balls,
             'best_target': best_target,
-            'safety_zones': self.dynamic_safety_zones
+            'safety_zones': self.dynamic_safety_zones,
+            # 围栏掩码一并返回，调用方绘制围栏时直接复用，无需再次检测
+            'fence_mask': fence_mask
         }
     
     def run(self, display=True, save_video=False, output_path=None):
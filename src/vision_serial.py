@@ -1,5 +1,7 @@
 import serial
-import time
+import struct
+import queue
+import threading
 
 # 全局变量
 ser = None
@@ -7,9 +9,24 @@ is_connected = False
 port = None
 baudrate = None
 
+# 后台发送线程：视觉循环只把数据包放入队列，由发送线程负责写串口，
+# 避免低波特率下串口写入阻塞视觉处理
+_tx_queue = queue.SimpleQueue()
+_tx_thread = None
+# 连接成功后缓存的写函数（ser.write），为None表示未连接
+_write = None
+# 用户调用disconnect_serial后置位，发送线程写入失败时不再自动重连；
+# 置位与发送线程的重连都在_conn_lock内进行，断开后串口不会被重新打开
+_tx_stopping = False
+_conn_lock = threading.Lock()
+
 # 协议定义
 START_BYTE = 0xAA
 END_BYTE = 0xBB
+# 数据部分：dx(int16)、dy(int16)、颜色ID(uint8)、距离(uint16)，小端紧凑排列
+_PAYLOAD = struct.Struct('<hhBH')
+# 整帧：起始字节 + 7字节数据部分 + 校验和 + 结束字节
+_FRAME = struct.Struct('<B7sBB')
 
 # 颜色映射
 color_id_map = {
@@ -28,17 +45,83 @@ center_x = image_width // 2
 center_y = image_height // 2
 actual_diameter_mm = 40
 reference_distance_mm = 500
+# 距离估算的分子（小球实际直径 × 参考距离），导入时计算一次
+_DIST_NUM = actual_diameter_mm * reference_distance_mm
 team_color = None
 
+def _tx_loop():
+    """发送线程主循环，队列中积压的多个数据包合并为一次写入"""
+    global is_connected
+    running = True
+    while running:
+        packet = _tx_queue.get()
+        if packet is None:  # 停止信号
+            break
+        batch = bytearray(packet)
+        while True:
+            try:
+                packet = _tx_queue.get_nowait()
+            except queue.Empty:
+                break
+            if packet is None:
+                running = False
+                break
+            batch.extend(packet)
+        
+        # 每批数据只取一次写函数；为None说明串口已断开或正在重连，丢弃这批数据
+        write = _write
+        if write is None:
+            continue
+        try:
+            write(batch)
+        except (serial.SerialException, OSError):
+            # 写入失败时重连一次并重发，仍失败则保持断开状态；用户已断开时不再重连
+            try:
+                with _conn_lock:
+                    if _tx_stopping:
+                        continue
+                    reopened = _open_serial(port, baudrate)
+                write = _write
+                if reopened and write is not None:
+                    write(batch)
+            except Exception as e:
+                is_connected = False
+
+def _start_tx_thread():
+    """启动发送线程（已在运行则忽略）"""
+    global _tx_thread
+    if _tx_thread is None or not _tx_thread.is_alive():
+        _tx_thread = threading.Thread(target=_tx_loop, daemon=True)
+        _tx_thread.start()
+
+def _stop_tx_thread():
+    """通知发送线程在写完已排队的数据后退出"""
+    global _tx_thread
+    if _tx_thread is not None and _tx_thread.is_alive():
+        _tx_queue.put(None)
+        _tx_thread.join(timeout=1.0)
+    _tx_thread = None
+
 def connect_serial(port_name, baud_rate):
     """简单的串口连接函数"""
-    global ser, is_connected, port, baudrate
+    global _tx_stopping
+    with _conn_lock:
+        _tx_stopping = False
+        connected = _open_serial(port_name, baud_rate)
+    if connected:
+        _start_tx_thread()
+    return connected
+
+def _open_serial(port_name, baud_rate):
+    """关闭旧连接并打开串口，成功时缓存写函数（调用方需持有_conn_lock）"""
+    global ser, is_connected, port, baudrate, _write
     
     port = port_name
     baudrate = baud_rate
     
     try:
         # 关闭之前的连接
+        _write = None
         if ser and ser.is_open:
             ser.close()
             
@@ -55,7 +138,7 @@ def connect_serial(port_name, baud_rate):
         
         is_connected = ser.is_open
         if is_connected:
-            pass
+            _write = ser.write
         return is_connected
         
     except Exception as e:
@@ -65,26 +148,20 @@ def connect_serial(port_name, baud_rate):
 
 def send_serial_data(dx, dy, color_id, distance):
     """发送数据到串口的核心函数"""
-    if not is_connected or not ser or not ser.is_open:
+    if _write is None:
         return False
     
     try:
-        # 边界检查
-        dx = max(-32768, min(dx, 32767))
-        dy = max(-32768, min(dy, 32767))
-        distance = max(0, min(distance, 65535))
+        # 边界检查（条件表达式内联，省去max/min的函数调用）
+        dx = -32768 if dx < -32768 else (32767 if dx > 32767 else dx)
+        dy = -32768 if dy < -32768 else (32767 if dy > 32767 else dy)
+        distance = 0 if distance < 0 else (65535 if distance > 65535 else distance)
         
-        # 构建数据包
-        packet = bytearray([START_BYTE])
-        packet.extend(dx.to_bytes(2, byteorder='little', signed=True))
-        packet.extend(dy.to_bytes(2, byteorder='little', signed=True))
-        packet.append(color_id)
-        packet.extend(distance.to_bytes(2, byteorder='little', signed=False))
+        # 构建数据部分，校验和直接对数据部分求和（不再对整包切片复制）
+        payload = _PAYLOAD.pack(dx, dy, color_id, distance)
         
-        # 计算校验和并发送
-        packet.append(sum(packet[1:]) & 0xFF)
-        packet.append(END_BYTE)
-        ser.write(packet)
+        # 一次打包成整帧，放入发送队列由后台线程写出
+        _tx_queue.put(_FRAME.pack(START_BYTE, payload, sum(payload) & 0xFF, END_BYTE))
         return True
         
     except Exception as e:
@@ -92,11 +169,14 @@ def send_serial_data(dx, dy, color_id, distance):
 
 def handle_ball_data(ball_data):
     """处理单个小球数据并发送"""
-    # 简单检查数据有效性
-    if not isinstance(ball_data, dict) or not all(k in ball_data for k in ['color', 'x', 'y']):
+    # 直接取字段，缺字段或类型不对时返回失败（正常路径上只查一次字典）
+    try:
+        color = ball_data['color']
+        x = ball_data['x']
+        y = ball_data['y']
+    except (KeyError, TypeError):
         return False
     
-    color = ball_data['color']
     ball_color_key = f'{color}_ball'
     
     # 检查颜色有效性
@@ -104,15 +184,16 @@ def handle_ball_data(ball_data):
         return False
     
     # 计算坐标偏移
-    dx = ball_data['x'] - center_x
-    dy = center_y - ball_data['y']
+    dx = x - center_x
+    dy = center_y - y
     
     # 估算距离
     radius = ball_data.get('radius', 0)
     if radius <= 0:
         distance = 1000  # 默认距离
     else:
-        distance = int(max(100, min((actual_diameter_mm * reference_distance_mm) / (radius * 2), 2000)))
+        distance = int(_DIST_NUM // (radius * 2))
+        distance = 100 if distance < 100 else (2000 if distance > 2000 else distance)
     
     # 发送安全区信息（如果需要）
     if ball_data.get('in_safety_zone', False) and team_color and f'{team_color}_zone' in color_id_map:
@@ -153,8 +234,13 @@ def set_team(team):
 
 def disconnect_serial():
     """断开串口连接"""
-    global ser, is_connected
+    global ser, is_connected, _write, _tx_stopping
     try:
+        # 先置位停止标志，发送线程写入失败时不会再把串口重新打开
+        with _conn_lock:
+            _tx_stopping = True
+        _stop_tx_thread()
+        _write = None
         if ser and ser.is_open:
             ser.close()
 
@@ -1,18 +1,21 @@
-import serial
-import time
-ser = None
-is_connected = False
+# 串口通信兼容入口：协议实现统一放在vision_serial.py，这里只保留默认端口配置，
+# 避免两份组包代码各自维护、优化只生效在其中一份
+from vision_serial import (
+    START_BYTE,
+    END_BYTE,
+    color_id_map,
+    connect_serial,
+    send_serial_data,
+    handle_ball_data,
+    process_balls_list,
+    set_team,
+    disconnect_serial
+)
+
 port = '/dev/ttyS3'
 baudrate = 115200
 
-START_BYTE = 0xAA
-END_BYTE = 0xBB
 
-color_id_map = {
-    'red_ball': 0,     # 红色小球
-    'blue_ball': 1,    # 蓝色小球  
-    'yellow_ball': 2,  # 黄色小球（危险目标）
-    'black_ball': 3,   # 黑色小球（核心目标）
-    'red_zone': 4,     # 红色安全区
-    'blue_zone': 5     # 蓝色安全区
-}
\ No newline at end of file
+def connect():
+    """使用默认端口和波特率连接串口"""
+    return connect_serial(port, baudrate)
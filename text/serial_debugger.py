@@ -16,25 +16,158 @@ Windows兼容版本
 """
 
 import serial
-import serial.tools.list_ports
+import struct
+import numbers
 import time
 import threading
-import json
+import queue
 import sys
 import os
 
 # 添加项目根目录到Python路径（Windows兼容方式）
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+def _crc8_of(byte):
+    """计算单字节的CRC-8值（多项式0x07）"""
+    crc = byte
+    for _ in range(8):
+        crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+# CRC-8查找表，导入时生成一次
+_CRC8_TABLE = bytes(_crc8_of(i) for i in range(256))
+
+def _crc8(data, table=_CRC8_TABLE):
+    """查表法计算CRC-8校验"""
+    crc = 0
+    for b in data:
+        crc = table[crc ^ b]
+    return crc
+
+# 超过该长度的数据改用numpy求和（实测约400字节时两者持平，512字节以上numpy稳定更快，短数据包仍走sum）
+_SUM8_NUMPY_MIN = 512
+
+def _sum8(data):
+    """累加和校验（取低8位），与现有电控协议一致"""
+    if len(data) >= _SUM8_NUMPY_MIN:
+        # numpy只在这里和send_multiple_balls_np中用到，按需导入，未安装numpy时调试工具仍可使用
+        import numpy as np
+        return int(np.frombuffer(data, dtype=np.uint8).sum(dtype=np.uint64)) & 0xFF
+    return sum(data) & 0xFF
+
+def _command_packet(cmd, arg, checksum=_sum8):
+    """生成5字节命令数据包：起始字节, 命令ID, 参数, 校验和, 结束字节"""
+    return bytes([0xAA, cmd, arg, checksum(bytes((cmd, arg))), 0xBB])
+
+# 停止命令的格式（内容固定，不可变对象可在线程间共享）
+# 0xAA - 起始字节
+# 0x00 - 停止命令ID
+# 0x00 - 校验和
+# 0xBB - 结束字节
+_STOP_FRAME = b'\xAA\x00\x00\xBB'
+
+# 各队伍的小球优先级表（只读共享，set_team_color直接引用，不再每次重建）
+_PRIORITIES_RED = {
+    'black': 30,   # 核心目标 - 最高优先级
+    'yellow': 20,  # 危险目标
+    'red': 10,     # 己方普通目标
+    'blue': 0      # 敌方目标 - 不收集
+}
+_PRIORITIES_BLUE = {
+    'black': 30,
+    'yellow': 20,
+    'blue': 10,
+    'red': 0
+}
+
+def _priority_summary(priorities):
+    """按优先级从高到低生成打印用的说明文字"""
+    labels = {'black': '黑色', 'yellow': '黄色'}
+    ranked = sorted(priorities, key=priorities.get, reverse=True)
+    return ' > '.join(f"{labels.get(color, color)}({priorities[color]})" for color in ranked)
+
+# 优先级说明文字，导入时生成一次，set_team_color直接引用
+_PRIORITY_SUMMARY = {
+    'red': _priority_summary(_PRIORITIES_RED),
+    'blue': _priority_summary(_PRIORITIES_BLUE)
+}
+
+
+# 小球数据包的数据部分：dx(int16), dy(int16), 颜色ID(uint8), 距离(uint16)，小端序
+_BALL_PAYLOAD = struct.Struct('<hhBH')
+# 完整的单球数据帧：起始字节 + 7字节数据部分 + 校验和 + 结束字节，一次pack生成整帧
+_BALL_FRAME = struct.Struct('<B7sBB')
+# 数据包字段的取值范围
+_MIN16 = -32768
+_MAX16 = 32767
+_MAXU16 = 65535
+# 批量小球数据包一帧最多包含的小球数（数量字段为1字节）
+_MAX_BATCH_BALLS = 255
+
+def _pack_ball(dx, dy, ball_id, distance):
+    """打包一个小球的数据部分，超出范围的字段截断到边界值"""
+    # 边界检查（直接比较模块常量，省去max/min的函数调用）
+    if dx < _MIN16:
+        dx = _MIN16
+    elif dx > _MAX16:
+        dx = _MAX16
+    if dy < _MIN16:
+        dy = _MIN16
+    elif dy > _MAX16:
+        dy = _MAX16
+    if distance < 0:
+        distance = 0
+    elif distance > _MAXU16:
+        distance = _MAXU16
+    return _BALL_PAYLOAD.pack(dx, dy, ball_id, distance)
+
+# 串口列表缓存的有效时间（秒）
+_PORTS_CACHE_TTL = 2.0
+
+# 接收缓冲区上限：一直等不到结束字节时只保留最后这么多字节，防止缓冲区无限增长
+_RX_BUF_LIMIT = 4096
 
 
 class SerialDebugger:
-    def __init__(self):
+    # 固定内容的命令数据包（起始字节, 命令ID, 参数, 校验和, 结束字节），预先生成避免每次发送时重建
+    _GRAB_PKT = _command_packet(0x01, 0x01)     # 抓取
+    _RELEASE_PKT = _command_packet(0x01, 0x00)  # 松开
+    _PLACE_PKTS = tuple(_command_packet(0x02, pos) for pos in range(5))  # 放置位置0-4
+    _ROTATION_PKTS = tuple(_command_packet(0x03, value) for value in range(256))  # 按映射后的速度值索引
+    # send_multiple_balls_np使用的结构化数组类型（字段描述，可直接作为numpy的dtype参数）
+    BALL_DTYPE = [('color_id', 'u1'), ('x', 'i2'), ('y', 'i2'), ('radius', 'u2'), ('in_safety_zone', '?')]
+    
+    def __init__(self, use_crc8=False, verbose=True, timeout=0.5, inter_byte_timeout=None):
+        """
+        :param use_crc8: 使用CRC-8代替累加和校验（需电控固件同时支持）
+        :param verbose: 是否打印每个数据包的发送详情（高频发送时关闭可省去字符串格式化）
+        :param timeout: 串口读超时（秒），接收线程等待第一个字节的最长时间；
+                        有数据时read()立即返回，断开时用cancel_read()唤醒，因此只影响空闲时的唤醒频率
+        :param inter_byte_timeout: 字节间超时（秒），None表示不启用
+        
+        注意: FTDI等USB转串口芯片默认有16ms的延迟计时器，低延迟场景下
+        需在Linux上执行 setserial /dev/ttyUSB0 low_latency 才能发挥作用
+        """
+        self.verbose = verbose
+        self.timeout = timeout
+        self.inter_byte_timeout = inter_byte_timeout
         self.ser = None
         self.is_connected = False
         self.receive_thread = None
         self.running = False
-        self.lock = threading.Lock()
+        # 发送队列和发送线程：各发送函数只把数据包放入队列，由发送线程写串口
+        self._tx_queue = queue.SimpleQueue()
+        self.send_thread = None
+        # 连接成功后缓存的写函数（ser.write），为None表示未连接
+        self._write = None
+        self._tx_fd = None  # POSIX下串口的文件描述符，发送线程直接os.write
+        # 接收缓冲区及结束字节的续扫位置（之前的字节已确认不含结束字节）
+        self._rx_buf = bytearray()
+        self._rx_head = 0  # 读指针：之前的数据已处理完毕，等待压缩
+        self._scan_from = 0
+        # 串口列表缓存
+        self._ports_cache = None
+        self._ports_cache_ts = 0.0
         # Windows系统标识
         self.is_windows = sys.platform.startswith('win')
         
@@ -44,6 +177,21 @@ class SerialDebugger:
         self.CMD_GRAB = 0x01
         self.CMD_PLACE = 0x02
         self.CMD_ROTATION = 0x03
+        # 命令响应的名称，按命令ID查表
+        self._ack_names = {
+            self.CMD_GRAB: '抓取',
+            self.CMD_PLACE: '放置',
+            self.CMD_ROTATION: '旋转'
+        }
+        
+        # 校验方式：默认累加和，可选CRC-8
+        self._checksum = _crc8 if use_crc8 else _sum8
+        if use_crc8:
+            # 按CRC-8重新生成固定命令数据包（覆盖类级别的累加和版本）
+            self._GRAB_PKT = _command_packet(self.CMD_GRAB, 0x01, _crc8)
+            self._RELEASE_PKT = _command_packet(self.CMD_GRAB, 0x00, _crc8)
+            self._PLACE_PKTS = tuple(_command_packet(self.CMD_PLACE, pos, _crc8) for pos in range(5))
+            self._ROTATION_PKTS = tuple(_command_packet(self.CMD_ROTATION, value, _crc8) for value in range(256))
         
         # 小球颜色映射
         self.color_to_id = {
@@ -59,6 +207,13 @@ class SerialDebugger:
             'blue': 5     # 蓝色安全区
         }
         
+        # 安全区数据包内容固定：与小球数据包相同的格式，颜色ID为4或5，dx、dy、distance均为0
+        self._SAFETY_ZONE_PKTS = {}
+        for zone_color, zone_id in self.safety_zone_color_to_id.items():
+            payload = _BALL_PAYLOAD.pack(0, 0, zone_id, 0)
+            self._SAFETY_ZONE_PKTS[zone_color] = _BALL_FRAME.pack(
+                self.START_BYTE, payload, self._checksum(payload), self.END_BYTE)
+        
         # 图像参数
         self.image_width = 640
         self.image_height = 480
@@ -69,19 +224,47 @@ class SerialDebugger:
         self.actual_diameter_mm = 40
         self.reference_pixel_radius = 20
         self.reference_distance_mm = 500
+        # 小球实际直径(mm) × 参考距离(mm)，距离估算的分子，由上面的参数计算一次
+        self._dist_num = self.actual_diameter_mm * self.reference_distance_mm
         
         # 队伍颜色和优先级
         self.team_color = None
         self.opponent_color = None
         self.priorities = {}
+        self.priorities_by_id = bytes(4)  # 按颜色ID索引的优先级（0红 1蓝 2黄 3黑）
         
         # 命令历史记录
         self.command_history = []
+        
+        # 菜单命令分发表：命令字符串直接映射到处理函数
+        self._commands = {
+            "1": lambda: self.list_ports(force=True),
+            "2": self._cmd_connect,
+            "3": self.disconnect,
+            "4": self.send_stop_command,
+            "5": self._cmd_grab,
+            "6": self._cmd_place,
+            "7": self._cmd_team_color,
+            "8": self._cmd_ball_data,
+            "9": self._cmd_safety_zone,
+            "10": self.run_test_sequence,
+            "11": self._cmd_custom_data
+        }
     
-    def list_ports(self):
-        """列出所有可用的串口（Windows兼容）"""
+    def list_ports(self, force=False):
+        """
+        列出所有可用的串口（Windows兼容）
+        :param force: 忽略缓存重新扫描；否则短时间内重复调用直接使用上次的扫描结果
+                      （Windows上枚举串口较慢）
+        """
         try:
-            ports = serial.tools.list_ports.comports()
+            now = time.monotonic()
+            if force or self._ports_cache is None or now - self._ports_cache_ts >= _PORTS_CACHE_TTL:
+                # 串口枚举模块只在真正扫描时才导入（Windows上会连带加载较重的系统接口），不拖慢启动
+                import serial.tools.list_ports
+                self._ports_cache = serial.tools.list_ports.comports()
+                self._ports_cache_ts = now
+            ports = self._ports_cache
             if not ports:
                 print("未找到可用的串口设备")
                 return []
@@ -102,10 +285,18 @@ class SerialDebugger:
     def connect(self, port, baudrate=115200):
         """连接到指定串口（Windows兼容）"""
         try:
+            # 停止旧的接收线程，避免重连后出现两个线程同时读串口
+            self._stop_receive_thread()
+            self._stop_send_thread()
+            
             # 确保之前的连接已关闭
             if self.ser and self.ser.is_open:
                 self.ser.close()
-            
+            # 旧连接已失效，先清除连接状态；新串口打开失败时send_data会如实报告未连接
+            self.is_connected = False
+            self._write = None
+            self._tx_fd = None
+
             # Windows系统上可能需要处理串口名称格式
             if self.is_windows and not port.startswith('COM'):
                 # 如果在Windows上没有指定COM前缀，自动添加
@@ -119,12 +310,23 @@ class SerialDebugger:
                 bytesize=serial.EIGHTBITS,
                 parity=serial.PARITY_NONE,
                 stopbits=serial.STOPBITS_ONE,
-                timeout=0.1,
-                write_timeout=0.5
+                timeout=self.timeout,
+                write_timeout=0.5,
+                inter_byte_timeout=self.inter_byte_timeout
             )
             
             # 检查连接是否成功
             if self.ser.is_open:
+                self._write = self.ser.write
+                # POSIX下发送直接写文件描述符，跳过pyserial的Python层封装；
+                # Windows或取不到描述符时仍使用ser.write
+                self._tx_fd = None
+                if not self.is_windows:
+                    try:
+                        self._tx_fd = self.ser.fileno()
+                        self._write = self._fd_write
+                    except (AttributeError, OSError, ValueError):
+                        self._tx_fd = None
                 self.is_connected = True
                 self.running = True
                 print(f"成功连接到串口: {port}")
@@ -133,6 +335,10 @@ class SerialDebugger:
                 self.receive_thread = threading.Thread(target=self.receive_loop, daemon=True)
                 self.receive_thread.start()
                 print("接收线程已启动")
+                
+                # 启动发送线程
+                self.send_thread = threading.Thread(target=self.send_loop, daemon=True)
+                self.send_thread.start()
                 return True
             else:
                 print(f"连接串口失败: 无法打开 {port}")
@@ -148,13 +354,16 @@ class SerialDebugger:
     def disconnect(self):
         """断开串口连接"""
         try:
-            self.running = False
-            time.sleep(0.1)  # 给接收线程一些时间来退出
+            self._stop_receive_thread()
+            # 写完已排队的数据后再关闭串口
+            self._stop_send_thread()
             
             if self.ser and self.ser.is_open:
                 self.ser.close()
                 print(f"已断开串口连接: {self.ser.port}")
             
+            self._write = None
+            self._tx_fd = None
             self.ser = None
             self.is_connected = False
             return True
@@ -163,99 +372,213 @@ class SerialDebugger:
             print(f"断开串口连接时发生错误: {e}")
             return False
     
+    def _stop_receive_thread(self):
+        """停止接收线程：取消正在阻塞的read()，不必等到读超时"""
+        self.running = False
+        if self.receive_thread and self.receive_thread.is_alive():
+            cancel_read = getattr(self.ser, 'cancel_read', None)
+            if cancel_read:
+                cancel_read()
+            self.receive_thread.join(timeout=(self.timeout or 0) + 0.5)
+        self.receive_thread = None
+    
+    def _stop_send_thread(self):
+        """通知发送线程在写完已排队的数据后退出"""
+        if self.send_thread and self.send_thread.is_alive():
+            self._tx_queue.put(None)
+            self.send_thread.join(timeout=1.0)
+        self.send_thread = None
+    
     def receive_loop(self):
-        """接收数据循环"""
-        buffer = bytearray()
+        """接收数据循环（线程在connect中随串口一起创建，重连前会先停止，因此可缓存串口对象）"""
+        ser = self.ser
+        read = ser.read
+        buffer = self._rx_buf
+        buffer.clear()
+        self._rx_head = 0
+        self._scan_from = 0
         
         while self.running:
             try:
-                if self.ser and self.ser.is_open:
-                    # 读取数据
-                    data = self.ser.read(1024)
-                    if data:
-                        buffer.extend(data)
-                        # 处理接收到的数据
-                        self._parse_received_data(buffer)
-                else:
-                    time.sleep(0.01)
+                # 缓冲区已有数据时一次读完；为空时阻塞等待第一个字节（最长为串口超时时间）。
+                # read(1024)会一直等到凑满1024字节或超时，导致每个数据包都延迟一个超时周期
+                waiting = ser.in_waiting
+                data = read(waiting if waiting else 1)
+                if data and not waiting:
+                    # 阻塞等到的首字节后面通常紧跟同一数据包的其余字节，一并读出后再解析，
+                    # 避免只含起始字节的半包先解析一轮
+                    waiting = ser.in_waiting
+                    if waiting:
+                        data += read(waiting)
+                if data:
+                    buffer.extend(data)
+                    # 处理接收到的数据
+                    self._parse_received_data()
                     
             except Exception as e:
+                if not self.running:
+                    break  # 断开连接时串口被关闭，直接退出
                 print(f"接收数据时发生错误: {e}")
                 # 如果发生错误，等待一段时间后重试
                 time.sleep(0.1)
     
-    def _parse_received_data(self, buffer):
-        """解析接收到的数据"""
+    def _parse_received_data(self):
+        """
+        解析接收缓冲区中的数据
+        一次读取可能包含多个数据包，循环处理缓冲区中所有完整的数据包，
+        不完整的尾部数据保留在缓冲区中等待下次读取；
+        等待期间记录已扫描的位置，下次只在新到达的字节中寻找结束字节。
+        已处理的数据只移动读指针，积累到一定量后再统一从缓冲区删除
+        :return: 本次处理的数据包数量
+        """
+        buffer = self._rx_buf
+        head = self._rx_head
+        count = 0
         try:
-            # 简单实现：寻找开始和结束字节
-            start_idx = buffer.find(self.START_BYTE)
-            end_idx = buffer.find(self.END_BYTE, start_idx + 1)
-            
-            if start_idx >= 0 and end_idx > start_idx:
-                # 提取完整的数据包
-                packet = buffer[start_idx:end_idx + 1]
-                # 从缓冲区中移除已处理的数据包
-                del buffer[0:end_idx + 1]
+            while True:
+                # 从读指针处寻找开始和结束字节
+                start_idx = buffer.find(self.START_BYTE, head)
+                if start_idx < 0:
+                    # 没有起始字节，缓冲区中都是无效数据
+                    buffer.clear()
+                    head = 0
+                    self._scan_from = 0
+                    break
+                end_idx = buffer.find(self.END_BYTE, max(start_idx + 1, self._scan_from))
+                if end_idx < 0:
+                    # 数据包尚不完整，跳过起始字节之前的无效数据后等待
+                    head = max(start_idx, len(buffer) - _RX_BUF_LIMIT)
+                    self._scan_from = len(buffer)
+                    break
                 
-                # 验证数据包长度和校验和
-                if len(packet) >= 5:  # 最小数据包长度：起始字节 + 数据 + 校验和 + 结束字节
-                    data_part = packet[1:-2]  # 去除起始字节和结束字节，以及校验和
-                    received_checksum = packet[-2]  # 校验和是结束字节前的字节
-                    
-                    # 计算校验和
-                    calculated_checksum = sum(data_part) & 0xFF
-                    
-                    if received_checksum == calculated_checksum:
-                        # 校验和正确，处理数据包
-                        print(f"接收到有效数据包: {packet.hex()}")
-                        # 这里可以添加更详细的数据包解析逻辑
-                        
-                        # 如果是控制命令的响应
-                        if len(data_part) > 0:
-                            cmd_id = data_part[0]
-                            # 根据命令ID处理不同的响应
-                            if cmd_id == self.CMD_GRAB:
-                                status = "成功" if len(data_part) > 1 and data_part[1] == 0x01 else "失败"
-                                print(f"抓取命令响应: {status}")
-                            elif cmd_id == self.CMD_PLACE:
-                                status = "成功" if len(data_part) > 1 and data_part[1] == 0x01 else "失败"
-                                print(f"放置命令响应: {status}")
-                            elif cmd_id == self.CMD_ROTATION:
-                                status = "成功" if len(data_part) > 1 and data_part[1] == 0x01 else "失败"
-                                print(f"旋转命令响应: {status}")
-                    else:
-                        print(f"校验和错误: 收到 {received_checksum:02X}, 计算 {calculated_checksum:02X}")
+                # 通过memoryview零拷贝访问完整的数据包，处理完毕后才能修改缓冲区
+                with memoryview(buffer) as view:
+                    self._handle_packet(view[start_idx:end_idx + 1])
+                head = end_idx + 1
+                count += 1
         except Exception as e:
             print(f"解析数据时发生错误: {e}")
+        
+        # 已处理的数据超过一半或超过上限时才压缩缓冲区，避免每个数据包都搬移剩余数据
+        if head and (head > _RX_BUF_LIMIT or head > len(buffer) // 2):
+            del buffer[:head]
+            self._scan_from = max(0, self._scan_from - head)
+            head = 0
+        self._rx_head = head
+        return count
     
-    def send_data(self, data):
-        """发送数据到串口"""
-        try:
-            if not self.is_connected or not self.ser:
-                print("错误: 未连接到串口")
-                return False
+    def _handle_packet(self, packet):
+        """校验并处理单个数据包（packet为memoryview，不在此函数外保留引用）"""
+        # 验证数据包长度和校验和
+        if len(packet) >= 5:  # 最小数据包长度：起始字节 + 数据 + 校验和 + 结束字节
+            data_part = packet[1:-2]  # 去除起始字节和结束字节，以及校验和
+            received_checksum = packet[-2]  # 校验和是结束字节前的字节
             
-            with self.lock:
-                # 发送数据
-                bytes_sent = self.ser.write(data)
-                # 确保数据被发送
-                self.ser.flush()
+            # 计算校验和
+            calculated_checksum = self._checksum(data_part)
+            
+            if received_checksum == calculated_checksum:
+                # 校验和正确，处理数据包；非verbose模式下跳过打印（省去hex()和stdout加锁）
+                if not self.verbose:
+                    return
+                print(f"接收到有效数据包: {packet.hex()}")
+                # 这里可以添加更详细的数据包解析逻辑
                 
-                if bytes_sent == len(data):
-                    print(f"成功发送 {bytes_sent} 字节: {data.hex()}")
-                    return True
+                # 如果是控制命令的响应，按命令ID查表得到命令名称
+                name = self._ack_names.get(data_part[0]) if len(data_part) > 0 else None
+                if name:
+                    status = "成功" if len(data_part) > 1 and data_part[1] == 0x01 else "失败"
+                    print(f"{name}命令响应: {status}")
+            else:
+                print(f"校验和错误: 收到 {received_checksum:02X}, 计算 {calculated_checksum:02X}")
+    
+    def send_data(self, data):
+        """发送数据到串口（放入发送队列，由发送线程写出）"""
+        if not self.is_connected or self._write is None:
+            print("错误: 未连接到串口")
+            return False
+        
+        self._tx_queue.put(bytes(data))
+        return True
+    
+    def send_loop(self):
+        """
+        发送数据循环
+        队列中积压的多个数据包合并为一次写入；收到flush()放入的事件时，
+        写完之前的数据并等待串口发送缓冲区清空后再通知调用方
+        """
+        while True:
+            item = self._tx_queue.get()
+            if item is None:  # 停止信号
+                break
+            
+            batch = bytearray()
+            waiters = []
+            stop = False
+            while True:
+                if item is None:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
                 else:
-                    print(f"发送数据失败: 只发送了 {bytes_sent}/{len(data)} 字节")
-                    return False
+                    batch.extend(item)
+                try:
+                    item = self._tx_queue.get_nowait()
+                except queue.Empty:
+                    break
+            
+            try:
+                if batch:
+                    bytes_sent = self._write(batch)
+                    if bytes_sent == len(batch):
+                        if self.verbose:
+                            print(f"成功发送 {bytes_sent} 字节: {batch.hex()}")
+                    else:
+                        print(f"发送数据失败: 只发送了 {bytes_sent}/{len(batch)} 字节")
+                if waiters:
+                    self.ser.flush()
                     
-        except serial.SerialException as e:
-            print(f"发送数据时发生串口错误: {e}")
-            # 尝试重新连接
-            self.disconnect()
+            except serial.SerialException as e:
+                print(f"发送数据时发生串口错误: {e}")
+                # 只标记为未连接，不立即关闭端口；由下一次connect决定是否重开，
+                # 避免瞬时错误时反复关闭/打开串口
+                self.is_connected = False
+            except Exception as e:
+                print(f"发送数据时发生错误: {e}")
+            
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                break
+    
+    def _fd_write(self, data):
+        """
+        直接写串口文件描述符（pyserial以非阻塞方式打开串口）；
+        内核发送缓冲区满写不完时，剩余部分交给ser.write按写超时等待发送
+        """
+        try:
+            sent = os.write(self._tx_fd, data)
+        except BlockingIOError:
+            sent = 0
+        except OSError as e:
+            raise serial.SerialException(f"写入串口失败: {e}")
+        if sent < len(data):
+            sent += self.ser.write(memoryview(data)[sent:])
+        return sent
+    
+    def flush(self, timeout=1.0):
+        """等待发送队列和串口发送缓冲区中的数据全部发出"""
+        if not self.is_connected or self._write is None:
+            print("错误: 未连接到串口")
             return False
-        except Exception as e:
-            print(f"发送数据时发生错误: {e}")
+        
+        done = threading.Event()
+        self._tx_queue.put(done)
+        if not done.wait(timeout):
+            print("等待数据发送完成超时")
             return False
+        return True
     
     def send_stop_command(self):
         """发送停止命令"""
@@ -263,20 +586,9 @@ class SerialDebugger:
             print("错误: 未连接到串口")
             return False
         
-        try:
-            # 停止命令的格式
-            # 0xAA - 起始字节
-            # 0x00 - 停止命令ID
-            # 0x00 - 校验和
-            # 0xBB - 结束字节
-            command = bytes([0xAA, 0x00, 0x00, 0xBB])
-            
+        if self.verbose:
             print("发送停止命令")
-            return self.send_data(command)
-            
-        except Exception as e:
-            print(f"发送停止命令时发生错误: {e}")
-            return False
+        return self.send_data(_STOP_FRAME)
     
     def send_grab_command(self, grab=True):
         """发送抓取命令"""
@@ -284,24 +596,18 @@ class SerialDebugger:
             print("错误: 未连接到串口")
             return False
         
-        try:
-            # 抓取命令的格式
-            # 0xAA - 起始字节
-            # 0x01 - 抓取命令ID
-            # 0x01 - 抓取 / 0x00 - 松开
-            # 校验和
-            # 0xBB - 结束字节
-            action = 0x01 if grab else 0x00
-            checksum = (self.CMD_GRAB + action) & 0xFF
-            command = bytes([0xAA, self.CMD_GRAB, action, checksum, 0xBB])
-            
-            action_text = "抓取" if grab else "松开"
+        # 抓取命令的格式
+        # 0xAA - 起始字节
+        # 0x01 - 抓取命令ID
+        # 0x01 - 抓取 / 0x00 - 松开
+        # 校验和
+        # 0xBB - 结束字节
+        command = self._GRAB_PKT if grab else self._RELEASE_PKT
+        
+        action_text = "抓取" if grab else "松开"
+        if self.verbose:
             print(f"发送{action_text}命令")
-            return self.send_data(command)
-            
-        except Exception as e:
-            print(f"发送抓取命令时发生错误: {e}")
-            return False
+        return self.send_data(command)
     
     def send_place_command(self, position=0):
         """发送放置命令"""
@@ -309,25 +615,23 @@ class SerialDebugger:
             print("错误: 未连接到串口")
             return False
         
-        try:
-            # 确保位置在有效范围内
-            position = max(0, min(4, position))
-            
-            # 放置命令的格式
-            # 0xAA - 起始字节
-            # 0x02 - 放置命令ID
-            # 位置值 (0-4)
-            # 校验和
-            # 0xBB - 结束字节
-            checksum = (self.CMD_PLACE + position) & 0xFF
-            command = bytes([0xAA, self.CMD_PLACE, position, checksum, 0xBB])
-            
-            print(f"发送放置命令，位置: {position}")
-            return self.send_data(command)
-            
-        except Exception as e:
-            print(f"发送放置命令时发生错误: {e}")
+        # 位置必须是整数（查表取预先生成的数据包），再限制在有效范围内
+        if not isinstance(position, numbers.Integral):
+            print(f"错误: 无效的放置位置: {position}")
             return False
+        position = max(0, min(4, position))
+        
+        # 放置命令的格式
+        # 0xAA - 起始字节
+        # 0x02 - 放置命令ID
+        # 位置值 (0-4)
+        # 校验和
+        # 0xBB - 结束字节
+        command = self._PLACE_PKTS[position]
+        
+        if self.verbose:
+            print(f"发送放置命令，位置: {position}")
+        return self.send_data(command)
     
     def send_rotation_command(self, speed=0):
         """发送旋转命令"""
@@ -335,28 +639,26 @@ class SerialDebugger:
             print("错误: 未连接到串口")
             return False
         
-        try:
-            # 限制速度范围
-            speed_value = max(-100, min(100, speed))
-            # 映射到0-255的范围 (0=逆时针, 128=停止, 255=顺时针)
-            mapped_value = 128 + int(speed_value * 1.27)
-            
-            # 旋转命令的格式
-            # 0xAA - 起始字节
-            # 0x03 - 旋转命令ID
-            # 旋转速度 (0-255)
-            # 校验和
-            # 0xBB - 结束字节
-            checksum = (self.CMD_ROTATION + mapped_value) & 0xFF
-            command = bytes([0xAA, self.CMD_ROTATION, mapped_value, checksum, 0xBB])
-            
-            direction = "顺时针" if speed_value > 0 else "逆时针" if speed_value < 0 else "停止"
-            print(f"发送旋转命令: {direction}，速度: {abs(speed_value)}%")
-            return self.send_data(command)
-            
-        except Exception as e:
-            print(f"发送旋转命令时发生错误: {e}")
+        # 速度必须是数值，再限制速度范围
+        if not isinstance(speed, numbers.Real):
+            print(f"错误: 无效的旋转速度: {speed}")
             return False
+        speed_value = max(-100, min(100, speed))
+        # 映射到0-255的范围 (0=逆时针, 128=停止, 255=顺时针)
+        mapped_value = 128 + int(speed_value * 1.27)
+        
+        # 旋转命令的格式
+        # 0xAA - 起始字节
+        # 0x03 - 旋转命令ID
+        # 旋转速度 (0-255)
+        # 校验和
+        # 0xBB - 结束字节
+        command = self._ROTATION_PKTS[mapped_value]
+        
+        direction = "顺时针" if speed_value > 0 else "逆时针" if speed_value < 0 else "停止"
+        if self.verbose:
+            print(f"发送旋转命令: {direction}，速度: {abs(speed_value)}%")
+        return self.send_data(command)
     
     def set_team_color(self, team_color):
         """设置队伍颜色"""
@@ -368,30 +670,20 @@ class SerialDebugger:
         self.opponent_color = 'blue' if team_color == 'red' else 'red'
         
         # 根据己方颜色设置优先级
-        self.priorities = {
-            'black': 30,   # 核心目标 - 最高优先级
-            'yellow': 20,  # 危险目标
-            team_color: 10,     # 己方普通目标
-            self.opponent_color: 0  # 敌方目标 - 不收集
-        }
+        self.priorities = _PRIORITIES_RED if team_color == 'red' else _PRIORITIES_BLUE
+        self.priorities_by_id = bytes(self.priorities[c] for c in ('red', 'blue', 'yellow', 'black'))
         
         print(f"队伍颜色设置完成: 己方{self.team_color.upper()}队")
-        print(f"优先级设置: 黑色(30) > 黄色(20) > {team_color}(10) > {self.opponent_color}(0)")
+        print(f"优先级设置: {_PRIORITY_SUMMARY[team_color]}")
         return True
     
     def estimate_distance(self, pixel_radius):
-        """估算距离"""
-        try:
-            if pixel_radius <= 0:
-                return 1000
-            
-            pixel_diameter = pixel_radius * 2
-            distance_mm = (self.actual_diameter_mm * self.reference_distance_mm) / pixel_diameter
-            return int(max(100, min(distance_mm, 2000)))
-            
-        except Exception as e:
-            print(f"距离估算错误: {e}")
+        """估算距离（整数运算，分子在初始化时由直径和参考距离预先计算）"""
+        if pixel_radius <= 0:
             return 1000
+        
+        distance_mm = int(self._dist_num // (pixel_radius * 2))
+        return 100 if distance_mm < 100 else (2000 if distance_mm > 2000 else distance_mm)
     
     def send_safety_zone_info(self, safety_zone_color):
         """发送安全区信息"""
@@ -399,33 +691,20 @@ class SerialDebugger:
             print("错误: 未连接到串口")
             return False
         
-        try:
-            # 数据验证
-            if safety_zone_color not in self.safety_zone_color_to_id:
-                print(f"错误: 无效的安全区颜色: {safety_zone_color}")
-                return False
-                
-            safety_zone_id = self.safety_zone_color_to_id[safety_zone_color]
-            
-            # 使用与小球数据包相同的格式，颜色ID为4或5
-            packet = bytearray([self.START_BYTE])
-            packet.extend(b'\x00\x00')  # dx=0
-            packet.extend(b'\x00\x00')  # dy=0
-            packet.append(safety_zone_id)  # 4=红色安全区, 5=蓝色安全区
-            packet.extend(b'\x00\x00')  # distance=0
-            
-            # 计算校验和
-            checksum = sum(packet[1:]) & 0xFF
-            packet.append(checksum)
-            packet.append(self.END_BYTE)
+        # 数据验证
+        if safety_zone_color not in self.safety_zone_color_to_id:
+            print(f"错误: 无效的安全区颜色: {safety_zone_color}")
+            return False
             
-            # 发送数据
+        safety_zone_id = self.safety_zone_color_to_id[safety_zone_color]
+        
+        # 数据包内容固定，直接使用初始化时生成好的整帧
+        packet = self._SAFETY_ZONE_PKTS[safety_zone_color]
+        
+        # 发送数据
+        if self.verbose:
             print(f"发送安全区信息: {safety_zone_color}安全区 (ID: {safety_zone_id})")
-            return self.send_data(packet)
-            
-        except Exception as e:
-            print(f"发送安全区信息失败: {e}")
-            return False
+        return self.send_data(packet)
     
     def send_ball_data(self, dx, dy, ball_color, distance):
         """发送小球数据"""
@@ -433,38 +712,48 @@ class SerialDebugger:
             print("错误: 未连接到串口")
             return False
 
-        try:
-            # 数据验证
-            if ball_color not in self.color_to_id:
-                print(f"错误: 无效的颜色: {ball_color}")
-                return False
-                
-            # 边界检查
-            dx = max(-32768, min(dx, 32767))
-            dy = max(-32768, min(dy, 32767))
-            distance = max(0, min(distance, 65535))
-            
-            ball_id = self.color_to_id[ball_color]
-            
-            # 构建数据包
-            packet = bytearray([self.START_BYTE])
-            packet.extend(dx.to_bytes(2, byteorder='little', signed=True))
-            packet.extend(dy.to_bytes(2, byteorder='little', signed=True))
-            packet.append(ball_id)
-            packet.extend(distance.to_bytes(2, byteorder='little', signed=False))
-            
-            # 计算校验和
-            checksum = sum(packet[1:]) & 0xFF
-            packet.append(checksum)
-            packet.append(self.END_BYTE)
+        # 数据验证
+        if ball_color not in self.color_to_id:
+            print(f"错误: 无效的颜色: {ball_color}")
+            return False
             
-            # 发送数据
+        ball_id = self.color_to_id[ball_color]
+        
+        # 构建数据部分并计算校验和，再一次性打包成整帧
+        payload = _pack_ball(dx, dy, ball_id, distance)
+        packet = _BALL_FRAME.pack(self.START_BYTE, payload, self._checksum(payload), self.END_BYTE)
+        
+        # 发送数据
+        if self.verbose:
             print(f"发送: {ball_color}球, 偏移({dx},{dy}), 距离{distance}mm")
-            return self.send_data(packet)
-            
-        except Exception as e:
-            print(f"发送小球数据失败: {e}")
+        return self.send_data(packet)
+    
+    def send_ball_batch(self, balls):
+        """
+        一帧发送多个小球数据（批量格式，需电控固件同时支持，格式见开发日志）
+        :param balls: [(dx, dy, ball_color, distance), ...]，最多255个
+        """
+        if not self.is_connected:
+            print("错误: 未连接到串口")
+            return False
+        
+        if not balls or len(balls) > _MAX_BATCH_BALLS:
+            print(f"错误: 小球数量应为1-{_MAX_BATCH_BALLS}个")
             return False
+        
+        # 数量字节 + 每个小球7字节的数据部分，校验和覆盖全部数据部分
+        payload = bytearray((len(balls),))
+        for dx, dy, ball_color, distance in balls:
+            if ball_color not in self.color_to_id:
+                print(f"错误: 无效的颜色: {ball_color}")
+                return False
+            payload += _pack_ball(dx, dy, self.color_to_id[ball_color], distance)
+        
+        packet = bytes((self.START_BYTE,)) + payload + bytes((self._checksum(payload), self.END_BYTE))
+        
+        if self.verbose:
+            print(f"批量发送: {len(balls)}个小球")
+        return self.send_data(packet)
     
     def send_test_ball_data(self, color="red", x=320, y=240, radius=20, in_safety_zone=False):
         """发送测试的球数据"""
@@ -499,34 +788,35 @@ class SerialDebugger:
                 print("错误: 请先设置队伍颜色")
                 return False
             
-            # 过滤可收集的小球
-            collectable_balls = []
+            # 单次遍历选出优先级最高的可收集小球（同优先级取先出现的），不建中间列表也不排序
+            get_priority = self.priorities.get
+            priority = 0
+            target_ball = None
+            has_ball_in_safety = False
             for ball in balls_list:
-                if isinstance(ball, dict) and self.priorities.get(ball.get('color', ''), 0) > 0:
-                    collectable_balls.append(ball)
+                if not isinstance(ball, dict):
+                    continue
+                if ball.get('in_safety_zone', False):
+                    has_ball_in_safety = True
+                ball_priority = get_priority(ball.get('color', ''), 0)
+                if ball_priority > priority:
+                    priority = ball_priority
+                    target_ball = ball
             
-            if not collectable_balls:
-                print("没有可收集的小球")
+            if target_ball is None:
+                if self.verbose:
+                    print("没有可收集的小球")
                 # 如果没有可收集的小球，但有安全区信息，发送安全区信息
                 if self.team_color in self.safety_zone_color_to_id:
                     return self.send_safety_zone_info(self.team_color)
                 return False
             
-            # 检查是否有小球在安全区内
-            has_ball_in_safety = any(ball.get('in_safety_zone', False) for ball in balls_list)
-            
             # 如果有小球在安全区内，发送安全区信息
             if has_ball_in_safety and self.team_color in self.safety_zone_color_to_id:
                 self.send_safety_zone_info(self.team_color)
             
-            # 按优先级排序并选择第一个
-            sorted_balls = sorted(collectable_balls, 
-                                key=lambda ball: self.priorities.get(ball.get('color', ''), 0), 
-                                reverse=True)
-            
-            target_ball = sorted_balls[0]
-            priority = self.priorities[target_ball['color']]
-            print(f"选择{target_ball['color']}球 (优先级: {priority})")
+            if self.verbose:
+                print(f"选择{target_ball['color']}球 (优先级: {priority})")
             
             # 计算dx, dy
             dx = target_ball['x'] - self.center_x
@@ -539,6 +829,56 @@ class SerialDebugger:
             print(f"处理多球数据失败: {e}")
             return False
     
+    def send_multiple_balls_np(self, balls):
+        """
+        send_multiple_balls的向量化版本，适合候选小球很多的情况
+        :param balls: BALL_DTYPE类型的结构化数组
+        """
+        import numpy as np
+        
+        try:
+            if not isinstance(balls, np.ndarray) or balls.dtype != np.dtype(self.BALL_DTYPE) or balls.size == 0:
+                print("错误: 无效的小球数组")
+                return False
+            
+            if not self.team_color:
+                print("错误: 请先设置队伍颜色")
+                return False
+            
+            # 查表得到每个小球的优先级，无效颜色ID视为0
+            color_ids = balls['color_id']
+            priority_table = np.frombuffer(self.priorities_by_id, dtype=np.uint8)
+            priorities = np.zeros(balls.size, dtype=np.uint8)
+            valid = color_ids < priority_table.size
+            priorities[valid] = priority_table[color_ids[valid]]
+            
+            idx = int(np.argmax(priorities))
+            if priorities[idx] == 0:
+                if self.verbose:
+                    print("没有可收集的小球")
+                if self.team_color in self.safety_zone_color_to_id:
+                    return self.send_safety_zone_info(self.team_color)
+                return False
+            
+            # 如果有小球在安全区内，发送安全区信息
+            if balls['in_safety_zone'].any() and self.team_color in self.safety_zone_color_to_id:
+                self.send_safety_zone_info(self.team_color)
+            
+            target_ball = balls[idx]
+            color = ('red', 'blue', 'yellow', 'black')[target_ball['color_id']]
+            if self.verbose:
+                print(f"选择{color}球 (优先级: {priorities[idx]})")
+            
+            dx = int(target_ball['x']) - self.center_x
+            dy = int(target_ball['y']) - self.center_y
+            distance = self.estimate_distance(int(target_ball['radius']))
+            
+            return self.send_ball_data(dx, dy, color, distance)
+            
+        except Exception as e:
+            print(f"处理多球数据失败: {e}")
+            return False
+    
     def run_test_sequence(self):
         """运行测试序列"""
         if not self.is_connected:
@@ -598,120 +938,117 @@ class SerialDebugger:
     
     def handle_command(self, cmd):
         """处理用户命令"""
-        if cmd == "1":
-            self.list_ports()
-            
-        elif cmd == "2":
-            ports = self.list_ports()
-            if ports:
-                try:
-                    print("\n请选择连接方式:")
-                    print("1. 从上面列表中选择串口")
-                    print("2. 手动输入串口名称")
-                    
-                    conn_type = input("请选择 (1-2): ")
-                    
-                    if conn_type == "1":
-                        choice = int(input("请选择串口 (输入序号): ")) - 1
-                        if 0 <= choice < len(ports):
-                            port = ports[choice].device
-                        else:
-                            print("无效的选择")
-                            return True
-                    elif conn_type == "2":
-                        # 手动输入模式，在Windows上提示输入COM端口
-                        if self.is_windows:
-                            port = input("请输入串口名称 (如 COM3): ")
-                            # 自动补全COM前缀
-                            if port.isdigit():
-                                port = f"COM{port}"
-                        else:
-                            port = input("请输入串口名称: ")
-                    else:
-                        print("无效的选择")
-                        return True
-                    
-                    baudrate = input("请输入波特率 (默认115200): ")
-                    baudrate = int(baudrate) if baudrate else 115200
-                    self.connect(port, baudrate)
-                except ValueError:
-                    print("请输入有效的数字")
-        
-        elif cmd == "3":
-            self.disconnect()
-        
-        elif cmd == "4":
-            self.send_stop_command()
-        
-        elif cmd == "5":
-            grab = input("抓取还是释放? (g/r, 默认g): ").lower() != "r"
-            self.send_grab_command(grab)
-        
-        elif cmd == "6":
-            try:
-                position = int(input("请输入放置位置 (0-4, 默认0): ") or "0")
-                if 0 <= position <= 4:
-                    self.send_place_command(position)
-                else:
-                    print("位置必须在0-4之间")
-            except ValueError:
-                print("请输入有效的数字")
+        if cmd == "0" or cmd.lower() == "q":
+            return False
         
-        elif cmd == "7":
-            color = input("请输入队伍颜色 (red/blue): ").strip().lower()
-            self.set_team_color(color)
+        handler = self._commands.get(cmd)
+        if handler is None:
+            print("未知命令，请重新输入")
+        else:
+            handler()
         
-        elif cmd == "8":
-            color = input("请输入球颜色 (red/blue/yellow/black, 默认red): ").lower() or "red"
-            if color not in ["red", "blue", "yellow", "black"]:
-                color = "red"
-            
+        return True
+    
+    def _cmd_connect(self):
+        """命令2：选择并连接串口"""
+        ports = self.list_ports()
+        if ports:
             try:
-                x = int(input("请输入X坐标 (默认320): ") or "320")
-                y = int(input("请输入Y坐标 (默认240): ") or "240")
-                radius = int(input("请输入半径 (默认20): ") or "20")
+                print("\n请选择连接方式:")
+                print("1. 从上面列表中选择串口")
+                print("2. 手动输入串口名称")
                 
-                in_safety = input("是否在安全区内？(y/n，默认n): ").strip().lower()
-                in_safety_zone = in_safety == 'y'
+                conn_type = input("请选择 (1-2): ")
                 
-                self.send_test_ball_data(color, x, y, radius, in_safety_zone)
-            except ValueError:
-                print("请输入有效的数字")
-        
-        elif cmd == "9":
-            if not self.team_color:
-                color = input("请输入安全区颜色 (red/blue): ").strip().lower()
-                if color in ['red', 'blue']:
-                    self.send_safety_zone_info(color)
+                if conn_type == "1":
+                    choice = int(input("请选择串口 (输入序号): ")) - 1
+                    if 0 <= choice < len(ports):
+                        port = ports[choice].device
+                    else:
+                        print("无效的选择")
+                        return
+                elif conn_type == "2":
+                    # 手动输入模式，在Windows上提示输入COM端口
+                    if self.is_windows:
+                        port = input("请输入串口名称 (如 COM3): ")
+                        # 自动补全COM前缀
+                        if port.isdigit():
+                            port = f"COM{port}"
+                    else:
+                        port = input("请输入串口名称: ")
                 else:
-                    print("错误: 无效的安全区颜色")
-            else:
-                # 使用已设置的队伍颜色
-                self.send_safety_zone_info(self.team_color)
-        
-        elif cmd == "10":
-            self.run_test_sequence()
-        
-        elif cmd == "11":
-            try:
-                # 输入格式: AA 01 02 BB (空格分隔的十六进制字节)
-                hex_input = input("请输入要发送的十六进制数据 (空格分隔): ")
-                # 分割并转换为字节
-                byte_values = [int(x, 16) for x in hex_input.split()]
-                data = bytes(byte_values)
+                    print("无效的选择")
+                    return
                 
-                print(f"发送自定义数据: {data.hex()}")
-                self.send_data(data)
+                baudrate = input("请输入波特率 (默认115200): ")
+                baudrate = int(baudrate) if baudrate else 115200
+                self.connect(port, baudrate)
             except ValueError:
-                print("错误: 无效的十六进制数据格式")
-        
-        elif cmd == "0" or cmd.lower() == "q":
-            return False
+                print("请输入有效的数字")
+    
+    def _cmd_grab(self):
+        """命令5：抓取/释放"""
+        grab = input("抓取还是释放? (g/r, 默认g): ").lower() != "r"
+        self.send_grab_command(grab)
+    
+    def _cmd_place(self):
+        """命令6：放置"""
+        try:
+            position = int(input("请输入放置位置 (0-4, 默认0): ") or "0")
+            if 0 <= position <= 4:
+                self.send_place_command(position)
+            else:
+                print("位置必须在0-4之间")
+        except ValueError:
+            print("请输入有效的数字")
+    
+    def _cmd_team_color(self):
+        """命令7：设置队伍颜色"""
+        color = input("请输入队伍颜色 (red/blue): ").strip().lower()
+        self.set_team_color(color)
+    
+    def _cmd_ball_data(self):
+        """命令8：发送测试小球数据"""
+        color = input("请输入球颜色 (red/blue/yellow/black, 默认red): ").lower() or "red"
+        if color not in ["red", "blue", "yellow", "black"]:
+            color = "red"
         
+        try:
+            x = int(input("请输入X坐标 (默认320): ") or "320")
+            y = int(input("请输入Y坐标 (默认240): ") or "240")
+            radius = int(input("请输入半径 (默认20): ") or "20")
+            
+            in_safety = input("是否在安全区内？(y/n，默认n): ").strip().lower()
+            in_safety_zone = in_safety == 'y'
+            
+            self.send_test_ball_data(color, x, y, radius, in_safety_zone)
+        except ValueError:
+            print("请输入有效的数字")
+    
+    def _cmd_safety_zone(self):
+        """命令9：发送安全区信息"""
+        if not self.team_color:
+            color = input("请输入安全区颜色 (red/blue): ").strip().lower()
+            if color in ['red', 'blue']:
+                self.send_safety_zone_info(color)
+            else:
+                print("错误: 无效的安全区颜色")
         else:
-            print("未知命令，请重新输入")
-        
-        return True
+            # 使用已设置的队伍颜色
+            self.send_safety_zone_info(self.team_color)
+    
+    def _cmd_custom_data(self):
+        """命令11：发送自定义十六进制数据"""
+        try:
+            # 输入格式: AA 01 02 BB (空格或逗号分隔的十六进制字节，也可连写为 AA0102BB)
+            hex_input = input("请输入要发送的十六进制数据 (空格分隔): ")
+            # 每个字节须为两位十六进制数，fromhex会跳过字节之间的空白
+            data = bytes.fromhex(hex_input.replace(',', ' '))
+            
+            print(f"发送自定义数据: {data.hex()}")
+            self.send_data(data)
+        except ValueError:
+            print("错误: 无效的十六进制数据格式")
     
     def run(self):
         """运行调试工具"""
@@ -737,5 +1074,5 @@ class SerialDebugger:
             print("程序已退出")
 
 if __name__ == "__main__":
-    debugger = SerialDebugger()
+    debugger = SerialDebugger(use_crc8='--crc8' in sys.argv, verbose='--quiet' not in sys.argv)
     debugger.run()
\ No newline at end of file
@@ -3,6 +3,8 @@ import numpy as np
 import json
 import os
 import time
+import threading
+from pathlib import Path
 
 # 全局配置
 VIDEO_WIDTH = 640
@@ -12,13 +14,23 @@ VIDEO_SOURCE = 9
 COLOR_NAME = 'purple'
 COLOR_DISPLAY_NAME = '紫色围栏(安全区围栏)'
 
-# 定义一个空函数，用于创建轨迹栏
-def nothing(x):
-    pass
-
 # 默认紫色阈值预设 - 针对比赛紫色围栏优化
 DEFAULT_THRESHOLDS = {'H Min': 125, 'S Min': 100, 'V Min': 100, 'H Max': 150, 'S Max': 255, 'V Max': 255}
 
+# 当前阈值：由各滑块的回调直接写入，主循环不再调用getTrackbarPos
+threshold_values = dict(DEFAULT_THRESHOLDS)
+
+# 阈值是否有变化：滑块被拖动（或程序调用setTrackbarPos）时置位，主循环据此才更新阈值范围
+thresholds_dirty = True
+
+def make_threshold_callback(name):
+    """生成单个滑块的回调，把新位置写入threshold_values并标记阈值有变化"""
+    def on_threshold_change(x):
+        global thresholds_dirty
+        threshold_values[name] = x
+        thresholds_dirty = True
+    return on_threshold_change
+
 # 初始化视频流 - 只使用摄像头模式
 try:
     # 打开摄像头
@@ -28,6 +40,8 @@ try:
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, VIDEO_WIDTH)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, VIDEO_HEIGHT)
     cap.set(cv2.CAP_PROP_FPS, FPS_TARGET)
+    # 驱动端只缓存1帧，read()总是拿到最新画面，调整滑块后下一帧即可看到效果（不支持的后端会忽略）
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
     
     if not cap.isOpened():
         exit(1)
@@ -38,26 +52,27 @@ except Exception as e:
 # 添加配置文件保存路径
 config_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config')
 os.makedirs(config_dir, exist_ok=True)
+# 阈值配置文件路径只拼接一次，加载和保存时直接使用
+config_file = os.path.join(config_dir, f"hsv_thresholds_{COLOR_NAME}.json")
 
 # 创建一个窗口和轨迹栏（滑动条）用于调整阈值
 window_name = f'{COLOR_DISPLAY_NAME}阈值调整'
 cv2.namedWindow(window_name)
 
-# 创建滑块，参数分别是：滑块名，窗口名，最小值，最大值，空函数
-cv2.createTrackbar('H Min', window_name, DEFAULT_THRESHOLDS['H Min'], 179, nothing) # H: 0-179
-cv2.createTrackbar('S Min', window_name, DEFAULT_THRESHOLDS['S Min'], 255, nothing) # S: 0-255
-cv2.createTrackbar('V Min', window_name, DEFAULT_THRESHOLDS['V Min'], 255, nothing) # V: 0-255
-cv2.createTrackbar('H Max', window_name, DEFAULT_THRESHOLDS['H Max'], 179, nothing)
-cv2.createTrackbar('S Max', window_name, DEFAULT_THRESHOLDS['S Max'], 255, nothing)
-cv2.createTrackbar('V Max', window_name, DEFAULT_THRESHOLDS['V Max'], 255, nothing)
+# 创建滑块，参数分别是：滑块名，窗口名，初始值，最大值，回调函数
+cv2.createTrackbar('H Min', window_name, DEFAULT_THRESHOLDS['H Min'], 179, make_threshold_callback('H Min')) # H: 0-179
+cv2.createTrackbar('S Min', window_name, DEFAULT_THRESHOLDS['S Min'], 255, make_threshold_callback('S Min')) # S: 0-255
+cv2.createTrackbar('V Min', window_name, DEFAULT_THRESHOLDS['V Min'], 255, make_threshold_callback('V Min')) # V: 0-255
+cv2.createTrackbar('H Max', window_name, DEFAULT_THRESHOLDS['H Max'], 179, make_threshold_callback('H Max'))
+cv2.createTrackbar('S Max', window_name, DEFAULT_THRESHOLDS['S Max'], 255, make_threshold_callback('S Max'))
+cv2.createTrackbar('V Max', window_name, DEFAULT_THRESHOLDS['V Max'], 255, make_threshold_callback('V Max'))
 
 def load_thresholds():
     """加载保存的阈值配置"""
-    config_file = os.path.join(config_dir, f"hsv_thresholds_{COLOR_NAME}.json")
     try:
         if os.path.exists(config_file):
-            with open(config_file, 'r') as f:
-                config_data = json.load(f)
+            # 直接解析字节内容，省去文本模式的解码和换行转换
+            config_data = json.loads(Path(config_file).read_bytes())
             
             if COLOR_NAME in config_data:
                 lower = config_data[COLOR_NAME]['lower']
@@ -103,50 +118,23 @@ def save_thresholds():
     }
     
     # 保存到文件
-    output_file = os.path.join(config_dir, f"hsv_thresholds_{COLOR_NAME}.json")
     try:
-        with open(output_file, 'w') as f:
+        with open(config_file, 'w') as f:
             json.dump(config_data, f, indent=2)
 
-        print(f"{COLOR_DISPLAY_NAME}阈值配置已保存到: {output_file}")
+        print(f"{COLOR_DISPLAY_NAME}阈值配置已保存到: {config_file}")
     except Exception as e:
         pass
         print(f"错误: 保存失败 - {e}")
-    config_file = os.path.join(config_dir, f"hsv_thresholds_{COLOR_NAME}.json")
-    try:
-        if os.path.exists(config_file):
-            with open(config_file, 'r') as f:
-                config_data = json.load(f)
-            
-            if COLOR_NAME in config_data:
-                lower = config_data[COLOR_NAME]['lower']
-                upper = config_data[COLOR_NAME]['upper']
-                
-                # 设置轨迹栏位置
-                cv2.setTrackbarPos('H Min', window_name, lower[0])
-                cv2.setTrackbarPos('S Min', window_name, lower[1])
-                cv2.setTrackbarPos('V Min', window_name, lower[2])
-                cv2.setTrackbarPos('H Max', window_name, upper[0])
-                cv2.setTrackbarPos('S Max', window_name, upper[1])
-                cv2.setTrackbarPos('V Max', window_name, upper[2])
-                
-        
-                print(f"已加载{COLOR_DISPLAY_NAME}保存的阈值配置")
-                return True
-
-    except Exception as e:
-        pass
-        print(f"错误: 加载失败 - {e}")
-    return False
 
 def print_current_thresholds():
     """打印当前阈值"""
-    h_min = cv2.getTrackbarPos('H Min', window_name)
-    s_min = cv2.getTrackbarPos('S Min', window_name)
-    v_min = cv2.getTrackbarPos('V Min', window_name)
-    h_max = cv2.getTrackbarPos('H Max', window_name)
-    s_max = cv2.getTrackbarPos('S Max', window_name)
-    v_max = cv2.getTrackbarPos('V Max', window_name)
+    h_min = threshold_values['H Min']
+    s_min = threshold_values['S Min']
+    v_min = threshold_values['V Min']
+    h_max = threshold_values['H Max']
+    s_max = threshold_values['S Max']
+    v_max = threshold_values['V Max']
     
     print(f"当前{COLOR_DISPLAY_NAME}HSV阈值设置:")
     print(f"Lower: [{h_min}, {s_min}, {v_min}]")
@@ -165,9 +153,69 @@ print("- 按 'q' 键退出")
 fps_start_time = time.time()
 fps_count = 0
 current_fps = 0
+info_text = f"FPS: {current_fps:.1f} | {COLOR_DISPLAY_NAME}"
+
+# 掩码和结果窗口每隔DISPLAY_INTERVAL帧刷新一次，调节滑块时立即刷新
+DISPLAY_INTERVAL = 2
+display_counter = 0
 
 # 比赛场景优化参数
 ENABLE_MORPHOLOGY = True  # 启用形态学操作进行去噪
+# 启用OpenCL（T-API）：整条HSV->阈值->形态学处理链在GPU/核显上执行，设备不支持时自动回退CPU
+USE_OPENCL = False
+if USE_OPENCL and not cv2.ocl.haveOpenCL():
+    print("当前OpenCV不支持OpenCL，使用CPU处理")
+    USE_OPENCL = False
+# 快速模式：先用pyrDown把画面缩小到1/2再做阈值和形态学，像素量减为1/4（调阈值只需看清掩码形状）
+FAST_MODE = False
+# 实际参与处理的图像尺寸（pyrDown输出尺寸为向上取整的一半）
+PROC_WIDTH = (VIDEO_WIDTH + 1) // 2 if FAST_MODE else VIDEO_WIDTH
+PROC_HEIGHT = (VIDEO_HEIGHT + 1) // 2 if FAST_MODE else VIDEO_HEIGHT
+# 形态学内核边长，默认3以保留围栏细节；现场噪声大时可调大
+# 内核保持矩形，OpenCV会把矩形内核拆成行、列两次一维最值滤波，调大尺寸后开销仍随边长线性增长
+MORPH_KERNEL_SIZE = 3
+# 启动时创建一次，循环内直接复用
+MORPH_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (MORPH_KERNEL_SIZE, MORPH_KERNEL_SIZE))
+# 开运算后紧跟闭运算时，中间连续两次k×k膨胀等价于一次(2k-1)×(2k-1)膨胀
+MORPH_KERNEL_FUSED = cv2.getStructuringElement(cv2.MORPH_RECT, (2 * MORPH_KERNEL_SIZE - 1, 2 * MORPH_KERNEL_SIZE - 1))
+
+# 阈值上下限数组只分配一次，每帧原地写入滑块值
+lower_bound = np.zeros(3, dtype=np.uint8)
+upper_bound = np.zeros(3, dtype=np.uint8)
+
+# 预分配每帧的输出缓冲区，通过dst=复用，避免每帧分配整帧大小的图像
+# 摄像头实际分辨率与设置不符时OpenCV会按需重新分配，这里接住返回值即可
+if USE_OPENCL:
+    # OpenCL模式下缓冲区放在设备端，中间结果不回传主机内存
+    hsv = cv2.UMat(PROC_HEIGHT, PROC_WIDTH, cv2.CV_8UC3)
+    mask = cv2.UMat(PROC_HEIGHT, PROC_WIDTH, cv2.CV_8UC1)
+else:
+    hsv = np.empty((PROC_HEIGHT, PROC_WIDTH, 3), dtype=np.uint8)
+    mask = np.empty((PROC_HEIGHT, PROC_WIDTH), dtype=np.uint8)
+    result = np.empty_like(hsv)
+if FAST_MODE:
+    small_frame = np.empty((PROC_HEIGHT, PROC_WIDTH, 3), dtype=np.uint8)
+
+# 采集线程：后台持续读取摄像头，只保留最新一帧（单槽覆盖），主循环处理时不必阻塞在cap.read()上
+latest_frame = None
+frame_lock = threading.Lock()
+frame_ready = threading.Event()
+capture_running = True
+
+def capture_loop():
+    """后台读取摄像头帧，新帧覆盖尚未处理的旧帧"""
+    global latest_frame
+    while capture_running:
+        ret, captured = cap.read()
+        if not ret:
+            time.sleep(0.1)  # 短暂休眠后重试
+            continue
+        with frame_lock:
+            latest_frame = captured
+            frame_ready.set()
+
+capture_thread = threading.Thread(target=capture_loop, daemon=True)
+capture_thread.start()
 
 while True:
     try:
@@ -178,66 +226,86 @@ while True:
             current_fps = fps_count / (current_time - fps_start_time)
             fps_start_time = current_time
             fps_count = 0
+            info_text = f"FPS: {current_fps:.1f} | {COLOR_DISPLAY_NAME}"
     
         
-        # 获取帧
-        ret, frame = cap.read()
-        if not ret:
-    
-            time.sleep(0.1)  # 短暂休眠后重试
+        # 获取采集线程的最新帧，暂无新帧时等待；摄像头卡顿时也处理窗口事件，保证能按q退出
+        if not frame_ready.wait(0.1):
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
             continue
+        with frame_lock:
+            frame = latest_frame
+            latest_frame = None
+            frame_ready.clear()
+
+        # 快速模式下后续处理和显示都在缩小后的画面上进行
+        if FAST_MODE:
+            frame = cv2.pyrDown(frame, dst=small_frame)
+
+        # OpenCL模式下上传一次帧数据，后续运算都作用在UMat上
+        src = cv2.UMat(frame) if USE_OPENCL else frame
 
         # 转换为HSV颜色空间，比RGB更易区分颜色
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        hsv = cv2.cvtColor(src, cv2.COLOR_BGR2HSV, dst=hsv)
 
-        # 从轨迹栏获取当前阈值
-        h_min = cv2.getTrackbarPos('H Min', window_name)
-        s_min = cv2.getTrackbarPos('S Min', window_name)
-        v_min = cv2.getTrackbarPos('V Min', window_name)
-        h_max = cv2.getTrackbarPos('H Max', window_name)
-        s_max = cv2.getTrackbarPos('S Max', window_name)
-        v_max = cv2.getTrackbarPos('V Max', window_name)
+        # 滑块有变化时才更新阈值范围，否则沿用上次的阈值范围
+        thresholds_changed = thresholds_dirty
+        if thresholds_dirty:
+            thresholds_dirty = False
+            h_min = threshold_values['H Min']
+            s_min = threshold_values['S Min']
+            v_min = threshold_values['V Min']
+            h_max = threshold_values['H Max']
+            s_max = threshold_values['S Max']
+            v_max = threshold_values['V Max']
 
-        # 定义阈值范围
-        lower_bound = np.array([h_min, s_min, v_min])
-        upper_bound = np.array([h_max, s_max, v_max])
+            # 定义阈值范围
+            lower_bound[0], lower_bound[1], lower_bound[2] = h_min, s_min, v_min
+            upper_bound[0], upper_bound[1], upper_bound[2] = h_max, s_max, v_max
+            threshold_text = f"HSV范围: [{h_min},{s_min},{v_min}] to [{h_max},{s_max},{v_max}]"
 
         # 根据阈值创建掩膜，在范围内的变为白色，不在的变为黑色
-        mask = cv2.inRange(hsv, lower_bound, upper_bound)
+        mask = cv2.inRange(hsv, lower_bound, upper_bound, dst=mask)
         
         # 应用形态学操作减少噪声 - 针对比赛现场优化
         if ENABLE_MORPHOLOGY:
-            # 使用3x3内核以保留围栏细节
-            kernel = np.ones((3, 3), np.uint8)
-            # 开运算：先腐蚀后膨胀，去除噪声点
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-            # 闭运算：先膨胀后腐蚀，连接断开的区域
-            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+            # 开运算（先腐蚀后膨胀，去除噪声点）+ 闭运算（先膨胀后腐蚀，连接断开的区域）
+            # 合并为 腐蚀 -> 大内核膨胀 -> 腐蚀，结果与两次morphologyEx完全相同，少扫一遍掩码
+            mask = cv2.erode(mask, MORPH_KERNEL)
+            mask = cv2.dilate(mask, MORPH_KERNEL_FUSED)
+            mask = cv2.erode(mask, MORPH_KERNEL)
         else:
             # 简单的腐蚀膨胀操作
-            kernel = np.ones((3, 3), np.uint8)
-            mask = cv2.erode(mask, kernel, iterations=1)
-            mask = cv2.dilate(mask, kernel, iterations=1)
+            mask = cv2.erode(mask, MORPH_KERNEL, iterations=1)
+            mask = cv2.dilate(mask, MORPH_KERNEL, iterations=1)
 
-        # 创建结果图像（可视化阈值效果）
-        result = cv2.bitwise_and(frame, frame, mask=mask)
+        # 本帧是否刷新掩码和结果窗口
+        display_counter += 1
+        refresh_mask = thresholds_changed or display_counter % DISPLAY_INTERVAL == 0
 
-        # 在原图上显示当前配置信息和FPS
-        info_text = f"FPS: {current_fps:.1f} | {COLOR_DISPLAY_NAME}"
-        
-        # 在图像上显示信息
+        # 创建结果图像（可视化阈值效果，只在需要刷新时计算），imshow可直接显示UMat
+        if refresh_mask:
+            if USE_OPENCL:
+                result = cv2.bitwise_and(src, src, mask=mask)
+            else:
+                # 带掩码运算不会改写掩码外的像素，复用缓冲区时需先清零
+                result.fill(0)
+                result = cv2.bitwise_and(frame, frame, dst=result, mask=mask)
+
+        # 在原图上显示当前配置信息和FPS（文字只在FPS或阈值变化时重新生成）
         cv2.putText(frame, info_text, (10, 30), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         
         # 在图像底部显示HSV阈值范围
-        threshold_text = f"HSV范围: [{h_min},{s_min},{v_min}] to [{h_max},{s_max},{v_max}]"
         cv2.putText(frame, threshold_text, (10, frame.shape[0] - 20), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 1)
         
         # 将原图、掩膜和结果显示出来
         cv2.imshow('比赛现场视频', frame)
-        cv2.imshow('颜色掩码', mask)
-        cv2.imshow('检测结果', result)
+        if refresh_mask:
+            cv2.imshow('颜色掩码', mask)
+            cv2.imshow('检测结果', result)
 
         # 处理按键
         key = cv2.waitKey(1) & 0xFF
@@ -268,6 +336,8 @@ while True:
         continue
 
 # 清理资源
+capture_running = False
+capture_thread.join(timeout=1.0)
 try:
     if cap is not None:
         cap.release()
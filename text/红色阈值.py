@@ -3,6 +3,7 @@ import numpy as np
 import json
 import os
 import time
+import threading
 
 # 全局配置
 VIDEO_WIDTH = 640
@@ -12,27 +13,50 @@ VIDEO_SOURCE = 9
 COLOR_NAME = 'red'
 COLOR_DISPLAY_NAME = '红色小球(普通球/对方球)'
 
-# 定义一个空函数，用于创建轨迹栏
-def nothing(x):
-    pass
+# 显式开启OpenCV的SIMD优化路径并设置并行线程数，留一个核心给采集线程和界面刷新
+cv2.setUseOptimized(True)
+cv2.setNumThreads(max(2, (os.cpu_count() or 2) - 1))
+print(f"OpenCV {cv2.__version__}，优化代码: {'开启' if cv2.useOptimized() else '关闭'}，线程数: {cv2.getNumThreads()}")
 
 # 默认红色阈值预设 - 针对比赛红色球优化
 DEFAULT_THRESHOLDS = {'H Min': 0, 'S Min': 100, 'V Min': 100, 'H Max': 10, 'S Max': 255, 'V Max': 255}
 
+# 当前阈值：由各滑块的回调直接写入，主循环不再调用getTrackbarPos
+threshold_values = dict(DEFAULT_THRESHOLDS)
+
+# 阈值是否有变化：滑块被拖动（或程序调用setTrackbarPos）时置位，主循环据此才更新阈值范围
+thresholds_dirty = True
+
+def make_threshold_callback(name):
+    """生成单个滑块的回调，把新位置写入threshold_values并标记阈值有变化"""
+    def on_threshold_change(x):
+        global thresholds_dirty
+        threshold_values[name] = x
+        thresholds_dirty = True
+    return on_threshold_change
+
 # 初始化视频流 - 只使用摄像头模式
 try:
     # 打开摄像头
     cap = cv2.VideoCapture(VIDEO_SOURCE)
     
     # 设置摄像头参数
+    # 先请求MJPEG格式再设分辨率：USB带宽约为YUYV的一半，640x480下更容易跑满帧率（不支持的摄像头保持原格式）
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, VIDEO_WIDTH)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, VIDEO_HEIGHT)
     cap.set(cv2.CAP_PROP_FPS, FPS_TARGET)
+    # 驱动端只缓存1帧，read()总是拿到最新画面，调整滑块后下一帧即可看到效果（不支持的后端会忽略）
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
     
     if not cap.isOpened():
 
         exit(1)
-    
+
+    # 打印摄像头实际使用的像素格式，确认MJPEG设置是否生效（后端不提供该属性时返回0）
+    fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+    if fourcc:
+        print(f"摄像头像素格式: {''.join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4))}")
   
 except Exception as e:
     pass
@@ -41,22 +65,23 @@ except Exception as e:
 # 添加配置文件保存路径
 config_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config')
 os.makedirs(config_dir, exist_ok=True)
+# 阈值配置文件路径只拼接一次，加载和保存时直接使用
+config_file = os.path.join(config_dir, f"hsv_thresholds_{COLOR_NAME}.json")
 
 # 创建一个窗口和轨迹栏（滑动条）用于调整阈值
 window_name = f'{COLOR_DISPLAY_NAME}阈值调整'
 cv2.namedWindow(window_name)
 
-# 创建滑块，参数分别是：滑块名，窗口名，最小值，最大值，空函数
-cv2.createTrackbar('H Min', window_name, DEFAULT_THRESHOLDS['H Min'], 179, nothing) # H: 0-179
-cv2.createTrackbar('S Min', window_name, DEFAULT_THRESHOLDS['S Min'], 255, nothing) # S: 0-255
-cv2.createTrackbar('V Min', window_name, DEFAULT_THRESHOLDS['V Min'], 255, nothing) # V: 0-255
-cv2.createTrackbar('H Max', window_name, DEFAULT_THRESHOLDS['H Max'], 179, nothing)
-cv2.createTrackbar('S Max', window_name, DEFAULT_THRESHOLDS['S Max'], 255, nothing)
-cv2.createTrackbar('V Max', window_name, DEFAULT_THRESHOLDS['V Max'], 255, nothing)
+# 创建滑块，参数分别是：滑块名，窗口名，初始值，最大值，回调函数
+cv2.createTrackbar('H Min', window_name, DEFAULT_THRESHOLDS['H Min'], 179, make_threshold_callback('H Min')) # H: 0-179
+cv2.createTrackbar('S Min', window_name, DEFAULT_THRESHOLDS['S Min'], 255, make_threshold_callback('S Min')) # S: 0-255
+cv2.createTrackbar('V Min', window_name, DEFAULT_THRESHOLDS['V Min'], 255, make_threshold_callback('V Min')) # V: 0-255
+cv2.createTrackbar('H Max', window_name, DEFAULT_THRESHOLDS['H Max'], 179, make_threshold_callback('H Max'))
+cv2.createTrackbar('S Max', window_name, DEFAULT_THRESHOLDS['S Max'], 255, make_threshold_callback('S Max'))
+cv2.createTrackbar('V Max', window_name, DEFAULT_THRESHOLDS['V Max'], 255, make_threshold_callback('V Max'))
 
 def load_thresholds():
     """加载保存的阈值配置"""
-    config_file = os.path.join(config_dir, f"hsv_thresholds_{COLOR_NAME}.json")
     try:
         if os.path.exists(config_file):
             with open(config_file, 'r') as f:
@@ -86,16 +111,26 @@ def load_thresholds():
 # 尝试加载保存的阈值配置
 load_thresholds()
 
+# 连续快速保存时各写线程依次进行，先写临时文件再整体替换，配置文件不会出现写了一半的内容
+config_write_lock = threading.Lock()
+
+def write_config_file(payload):
+    """把序列化好的阈值配置写入临时文件后替换配置文件（在后台线程中运行）"""
+    try:
+        with config_write_lock:
+            tmp_file = config_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_file, config_file)
+
+        print(f"{COLOR_DISPLAY_NAME}阈值配置已保存到: {config_file}")
+    except Exception as e:
+        pass
+        print(f"错误: 保存失败 - {e}")
+
 def save_thresholds():
     """保存当前阈值配置"""
-    thresholds = {
-        'H Min': cv2.getTrackbarPos('H Min', window_name),
-        'S Min': cv2.getTrackbarPos('S Min', window_name),
-        'V Min': cv2.getTrackbarPos('V Min', window_name),
-        'H Max': cv2.getTrackbarPos('H Max', window_name),
-        'S Max': cv2.getTrackbarPos('S Max', window_name),
-        'V Max': cv2.getTrackbarPos('V Max', window_name)
-    }
+    thresholds = threshold_values
     
     # 转换为配置文件格式
     config_data = {
@@ -105,51 +140,18 @@ def save_thresholds():
         }
     }
     
-    # 保存到文件
-    output_file = os.path.join(config_dir, f"hsv_thresholds_{COLOR_NAME}.json")
-    try:
-        with open(output_file, 'w') as f:
-            json.dump(config_data, f, indent=2)
-
-        print(f"{COLOR_DISPLAY_NAME}阈值配置已保存到: {output_file}")
-    except Exception as e:
-        pass
-        print(f"错误: 保存失败 - {e}")
-    config_file = os.path.join(config_dir, f"hsv_thresholds_{COLOR_NAME}.json")
-    try:
-        if os.path.exists(config_file):
-            with open(config_file, 'r') as f:
-                config_data = json.load(f)
-            
-            if COLOR_NAME in config_data:
-                lower = config_data[COLOR_NAME]['lower']
-                upper = config_data[COLOR_NAME]['upper']
-                
-                # 设置轨迹栏位置
-                cv2.setTrackbarPos('H Min', window_name, lower[0])
-                cv2.setTrackbarPos('S Min', window_name, lower[1])
-                cv2.setTrackbarPos('V Min', window_name, lower[2])
-                cv2.setTrackbarPos('H Max', window_name, upper[0])
-                cv2.setTrackbarPos('S Max', window_name, upper[1])
-                cv2.setTrackbarPos('V Max', window_name, upper[2])
-                
-        
-                print(f"已加载{COLOR_DISPLAY_NAME}保存的阈值配置")
-                return True
-
-    except Exception as e:
-        pass
-        print(f"错误: 加载失败 - {e}")
-    return False
+    # 在主线程中完成序列化，写文件放到后台线程，避免磁盘I/O卡住画面刷新（非守护线程，退出前会等写完）
+    payload = json.dumps(config_data, indent=2).encode('utf-8')
+    threading.Thread(target=write_config_file, args=(payload,)).start()
 
 def print_current_thresholds():
     """打印当前阈值"""
-    h_min = cv2.getTrackbarPos('H Min', window_name)
-    s_min = cv2.getTrackbarPos('S Min', window_name)
-    v_min = cv2.getTrackbarPos('V Min', window_name)
-    h_max = cv2.getTrackbarPos('H Max', window_name)
-    s_max = cv2.getTrackbarPos('S Max', window_name)
-    v_max = cv2.getTrackbarPos('V Max', window_name)
+    h_min = threshold_values['H Min']
+    s_min = threshold_values['S Min']
+    v_min = threshold_values['V Min']
+    h_max = threshold_values['H Max']
+    s_max = threshold_values['S Max']
+    v_max = threshold_values['V Max']
     
     print(f"当前{COLOR_DISPLAY_NAME}HSV阈值设置:")
     print(f"Lower: [{h_min}, {s_min}, {v_min}]")
@@ -159,18 +161,71 @@ def print_current_thresholds():
 print(f"==== {COLOR_DISPLAY_NAME}阈值调整工具 ====")
 print("使用说明:")
 print("- 调整滑动条来设置HSV阈值")
+print("- H Min 大于 H Max 时按色相环绕处理（如红色 170~10）")
 print("- 按 's' 键保存当前阈值配置")
 print("- 按 'p' 键打印当前阈值设置")
 print("- 按 'r' 键恢复默认阈值")
+print("- 按 'f' 键切换快速模式(半分辨率预览)")
 print("- 按 'q' 键退出")
 
 # 性能监控变量
 fps_start_time = time.time()
 fps_count = 0
 current_fps = 0
+info_text = f"FPS: {current_fps:.1f} | {COLOR_DISPLAY_NAME}"
+
+# 结果窗口与掩码窗口内容重复，每隔RESULT_INTERVAL帧刷新一次，调节滑块时立即刷新
+RESULT_INTERVAL = 3
+display_counter = 0
 
 # 比赛场景优化参数
 ENABLE_MORPHOLOGY = True  # 启用形态学操作进行去噪
+# 形态学内核只生成一次：使用3x3矩形内核以保留小球细节
+MORPH_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+# 快速模式：先用pyrDown把画面缩小到1/2再做阈值和形态学，像素量减为1/4（按f键切换，需要逐像素预览时关闭）
+fast_mode = False
+
+# 阈值上下限数组只分配一次，滑块值变化时才原地更新
+lower_bound = np.zeros(3, dtype=np.uint8)
+upper_bound = np.zeros(3, dtype=np.uint8)
+# 色相跨0环绕（H Min > H Max）时拆成[H Min, 179]和[0, H Max]两段，第二段使用这组上下限
+lower_bound_wrap = np.zeros(3, dtype=np.uint8)
+upper_bound_wrap = np.zeros(3, dtype=np.uint8)
+hue_wraps = False
+
+# 预分配每帧的输出缓冲区，通过dst=复用，避免每帧分配整帧大小的图像
+# 摄像头实际分辨率与设置不符时OpenCV会按需重新分配，这里接住返回值即可
+hsv = np.empty((VIDEO_HEIGHT, VIDEO_WIDTH, 3), dtype=np.uint8)
+mask = np.empty((VIDEO_HEIGHT, VIDEO_WIDTH), dtype=np.uint8)
+mask_tmp = np.empty_like(mask)
+result = np.empty_like(hsv)
+# 快速模式下缩小后的画面（pyrDown输出尺寸为向上取整的一半）
+small_frame = np.empty(((VIDEO_HEIGHT + 1) // 2, (VIDEO_WIDTH + 1) // 2, 3), dtype=np.uint8)
+# 掩码窗口按半分辨率显示，最近邻缩放保持二值边缘清晰，也减少界面刷新的数据量
+MASK_DISPLAY_SIZE = ((VIDEO_WIDTH + 1) // 2, (VIDEO_HEIGHT + 1) // 2)
+mask_display = np.empty((MASK_DISPLAY_SIZE[1], MASK_DISPLAY_SIZE[0]), dtype=np.uint8)
+
+# 摄像头读取放到后台线程，与阈值处理和窗口刷新并行
+# 只保留最新一帧：处理跟不上时旧帧直接被覆盖，画面不会越来越滞后
+latest_frame = None
+frame_lock = threading.Lock()
+frame_ready = threading.Event()
+capture_running = True
+
+def capture_loop():
+    """后台读取摄像头帧，新帧覆盖尚未处理的旧帧"""
+    global latest_frame
+    while capture_running:
+        ret, captured = cap.read()
+        if not ret:
+            time.sleep(0.1)  # 短暂休眠后重试
+            continue
+        with frame_lock:
+            latest_frame = captured
+            frame_ready.set()
+
+capture_thread = threading.Thread(target=capture_loop, daemon=True)
+capture_thread.start()
 
 while True:
     try:
@@ -181,66 +236,98 @@ while True:
             current_fps = fps_count / (current_time - fps_start_time)
             fps_start_time = current_time
             fps_count = 0
+            info_text = f"FPS: {current_fps:.1f} | {COLOR_DISPLAY_NAME}"
     
         
-        # 获取帧
-        ret, frame = cap.read()
-        if not ret:
-    
-            time.sleep(0.1)  # 短暂休眠后重试
+        # 获取采集线程的最新帧，暂无新帧时等待；摄像头卡顿时也处理窗口事件，保证能按q退出
+        if not frame_ready.wait(0.1):
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
             continue
+        with frame_lock:
+            frame = latest_frame
+            latest_frame = None
+            frame_ready.clear()
+
+        # 快速模式下后续处理和显示都在缩小后的画面上进行，切换模式时缓冲区由OpenCV按新尺寸重新分配
+        if fast_mode:
+            frame = cv2.pyrDown(frame, dst=small_frame)
 
         # 转换为HSV颜色空间，比RGB更易区分颜色
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=hsv)
 
-        # 从轨迹栏获取当前阈值
-        h_min = cv2.getTrackbarPos('H Min', window_name)
-        s_min = cv2.getTrackbarPos('S Min', window_name)
-        v_min = cv2.getTrackbarPos('V Min', window_name)
-        h_max = cv2.getTrackbarPos('H Max', window_name)
-        s_max = cv2.getTrackbarPos('S Max', window_name)
-        v_max = cv2.getTrackbarPos('V Max', window_name)
+        # 滑块有变化时才更新阈值范围，否则沿用上次的阈值范围
+        thresholds_changed = thresholds_dirty
+        if thresholds_dirty:
+            thresholds_dirty = False
+            h_min = threshold_values['H Min']
+            s_min = threshold_values['S Min']
+            v_min = threshold_values['V Min']
+            h_max = threshold_values['H Max']
+            s_max = threshold_values['S Max']
+            v_max = threshold_values['V Max']
 
-        # 定义阈值范围
-        lower_bound = np.array([h_min, s_min, v_min])
-        upper_bound = np.array([h_max, s_max, v_max])
+            # 定义阈值范围
+            hue_wraps = h_min > h_max
+            if hue_wraps:
+                lower_bound[0], lower_bound[1], lower_bound[2] = h_min, s_min, v_min
+                upper_bound[0], upper_bound[1], upper_bound[2] = 179, s_max, v_max
+                lower_bound_wrap[0], lower_bound_wrap[1], lower_bound_wrap[2] = 0, s_min, v_min
+                upper_bound_wrap[0], upper_bound_wrap[1], upper_bound_wrap[2] = h_max, s_max, v_max
+            else:
+                lower_bound[0], lower_bound[1], lower_bound[2] = h_min, s_min, v_min
+                upper_bound[0], upper_bound[1], upper_bound[2] = h_max, s_max, v_max
+            threshold_text = f"HSV范围: [{h_min},{s_min},{v_min}] to [{h_max},{s_max},{v_max}]"
 
         # 根据阈值创建掩膜，在范围内的变为白色，不在的变为黑色
-        mask = cv2.inRange(hsv, lower_bound, upper_bound)
+        mask = cv2.inRange(hsv, lower_bound, upper_bound, dst=mask)
+        if hue_wraps:
+            # 环绕区间再算一段并合并，mask_tmp此时尚未使用，借作临时缓冲区
+            mask_tmp = cv2.inRange(hsv, lower_bound_wrap, upper_bound_wrap, dst=mask_tmp)
+            mask = cv2.bitwise_or(mask, mask_tmp, dst=mask)
         
         # 应用形态学操作减少噪声 - 针对比赛现场优化
-        if ENABLE_MORPHOLOGY:
-            # 使用3x3内核以保留小球细节
-            kernel = np.ones((3, 3), np.uint8)
+        mask_pixels = cv2.countNonZero(mask)
+        if mask_pixels == 0 or mask_pixels == mask.size:
+            # 掩码全黑或全白时形态学运算不会改变掩码，直接跳过（拖动滑块时常见）
+            pass
+        elif ENABLE_MORPHOLOGY:
             # 开运算：先腐蚀后膨胀，去除噪声点
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+            mask_tmp = cv2.morphologyEx(mask, cv2.MORPH_OPEN, MORPH_KERNEL, dst=mask_tmp)
             # 闭运算：先膨胀后腐蚀，连接断开的区域
-            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+            mask = cv2.morphologyEx(mask_tmp, cv2.MORPH_CLOSE, MORPH_KERNEL, dst=mask)
         else:
-            # 简单的腐蚀膨胀操作
-            kernel = np.ones((3, 3), np.uint8)
-            mask = cv2.erode(mask, kernel, iterations=1)
-            mask = cv2.dilate(mask, kernel, iterations=1)
+            # 简单的腐蚀膨胀操作（先腐蚀后膨胀即开运算，一次调用完成）
+            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, MORPH_KERNEL, dst=mask)
 
-        # 创建结果图像（可视化阈值效果）
-        result = cv2.bitwise_and(frame, frame, mask=mask)
+        # 本帧是否刷新结果窗口
+        display_counter += 1
+        refresh_result = thresholds_changed or display_counter % RESULT_INTERVAL == 0
 
-        # 在原图上显示当前配置信息和FPS
-        info_text = f"FPS: {current_fps:.1f} | {COLOR_DISPLAY_NAME}"
-        
-        # 在图像上显示信息
+        # 创建结果图像（可视化阈值效果，只在需要刷新时计算），按掩码直接拷贝像素，不必逐像素做与运算
+        if refresh_result:
+            # 带掩码拷贝不会改写掩码外的像素，复用缓冲区时需先清零
+            result.fill(0)
+            result = cv2.copyTo(frame, mask, result)
+
+        # 在原图上显示当前配置信息和FPS（文字只在FPS或阈值变化时重新生成）
         cv2.putText(frame, info_text, (10, 30), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         
         # 在图像底部显示HSV阈值范围
-        threshold_text = f"HSV范围: [{h_min},{s_min},{v_min}] to [{h_max},{s_max},{v_max}]"
         cv2.putText(frame, threshold_text, (10, frame.shape[0] - 20), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 1)
         
         # 将原图、掩膜和结果显示出来
         cv2.imshow('比赛现场视频', frame)
-        cv2.imshow('颜色掩码', mask)
-        cv2.imshow('检测结果', result)
+        if (mask.shape[1], mask.shape[0]) == MASK_DISPLAY_SIZE:
+            # 快速模式下掩码已是显示尺寸，无需缩放
+            cv2.imshow('颜色掩码', mask)
+        else:
+            mask_display = cv2.resize(mask, MASK_DISPLAY_SIZE, dst=mask_display, interpolation=cv2.INTER_NEAREST)
+            cv2.imshow('颜色掩码', mask_display)
+        if refresh_result:
+            cv2.imshow('检测结果', result)
 
         # 处理按键
         key = cv2.waitKey(1) & 0xFF
@@ -250,6 +337,10 @@ while True:
         elif key == ord('s'):
             # 保存阈值配置
             save_thresholds()
+        elif key == ord('f'):
+            # 切换快速模式
+            fast_mode = not fast_mode
+            print(f"快速模式已{'开启' if fast_mode else '关闭'}")
         elif key == ord('p'):
             # 打印当前阈值
             print_current_thresholds()
@@ -271,6 +362,8 @@ while True:
         continue
 
 # 清理资源
+capture_running = False
+capture_thread.join(timeout=1.0)
 try:
     if cap is not None:
         cap.release()
@@ -3,6 +3,7 @@ import numpy as np
 import json
 import os
 import time
+import threading
 
 # 全局配置
 VIDEO_WIDTH = 640
@@ -12,28 +13,51 @@ VIDEO_SOURCE = 0
 COLOR_NAME = 'black'
 COLOR_DISPLAY_NAME = '黑色小球(核心球)'
 
-# 定义一个空函数，用于创建轨迹栏
-def nothing(x):
-    pass
+# 显式开启OpenCV的SIMD优化路径并设置并行线程数，留一个核心给采集线程和界面刷新
+cv2.setUseOptimized(True)
+cv2.setNumThreads(max(2, (os.cpu_count() or 2) - 1))
+print(f"OpenCV {cv2.__version__}，优化代码: {'开启' if cv2.useOptimized() else '关闭'}，线程数: {cv2.getNumThreads()}")
 
 # 默认黑色阈值预设 - 针对比赛黑色核心球优化
 # 黑色主要关注V通道低值，H和S范围较宽
 DEFAULT_THRESHOLDS = {'H Min': 0, 'S Min': 0, 'V Min': 0, 'H Max': 180, 'S Max': 255, 'V Max': 80}
 
+# 当前阈值：由各滑块的回调直接写入，主循环不再调用getTrackbarPos
+threshold_values = dict(DEFAULT_THRESHOLDS)
+
+# 阈值是否有变化：滑块被拖动（或程序调用setTrackbarPos）时置位，主循环据此才更新阈值范围
+thresholds_dirty = True
+
+def make_threshold_callback(name):
+    """生成单个滑块的回调，把新位置写入threshold_values并标记阈值有变化"""
+    def on_threshold_change(x):
+        global thresholds_dirty
+        threshold_values[name] = x
+        thresholds_dirty = True
+    return on_threshold_change
+
 # 初始化视频流 - 只使用摄像头模式
 try:
     # 打开摄像头
     cap = cv2.VideoCapture(VIDEO_SOURCE)
     
     # 设置摄像头参数
+    # 先请求MJPEG格式再设分辨率：USB带宽约为YUYV的一半，640x480下更容易跑满帧率（不支持的摄像头保持原格式）
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, VIDEO_WIDTH)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, VIDEO_HEIGHT)
     cap.set(cv2.CAP_PROP_FPS, FPS_TARGET)
+    # 驱动端只缓存1帧，read()总是拿到最新画面，调整滑块后下一帧即可看到效果（不支持的后端会忽略）
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
     
     if not cap.isOpened():
 
         exit(1)
-    
+
+    # 打印摄像头实际使用的像素格式，确认MJPEG设置是否生效（后端不提供该属性时返回0）
+    fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+    if fourcc:
+        print(f"摄像头像素格式: {''.join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4))}")
   
 except Exception as e:
       pass
@@ -42,22 +66,26 @@ except Exception as e:
 # 添加配置文件保存路径
 config_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config')
 os.makedirs(config_dir, exist_ok=True)
+# 阈值配置文件路径只拼接一次，加载和保存时直接使用
+config_file = os.path.join(config_dir, f"hsv_thresholds_{COLOR_NAME}.json")
 
 # 创建一个窗口和轨迹栏（滑动条）用于调整阈值
 window_name = f'{COLOR_DISPLAY_NAME}阈值调整'
 cv2.namedWindow(window_name)
 
-# 创建滑块，参数分别是：滑块名，窗口名，最小值，最大值，空函数
-cv2.createTrackbar('H Min', window_name, DEFAULT_THRESHOLDS['H Min'], 179, nothing) # H: 0-179
-cv2.createTrackbar('S Min', window_name, DEFAULT_THRESHOLDS['S Min'], 255, nothing) # S: 0-255
-cv2.createTrackbar('V Min', window_name, DEFAULT_THRESHOLDS['V Min'], 255, nothing) # V: 0-255
-cv2.createTrackbar('H Max', window_name, DEFAULT_THRESHOLDS['H Max'], 179, nothing)
-cv2.createTrackbar('S Max', window_name, DEFAULT_THRESHOLDS['S Max'], 255, nothing)
-cv2.createTrackbar('V Max', window_name, DEFAULT_THRESHOLDS['V Max'], 255, nothing)
+# 创建滑块，参数分别是：滑块名，窗口名，初始值，最大值，回调函数
+cv2.createTrackbar('H Min', window_name, DEFAULT_THRESHOLDS['H Min'], 179, make_threshold_callback('H Min')) # H: 0-179
+cv2.createTrackbar('S Min', window_name, DEFAULT_THRESHOLDS['S Min'], 255, make_threshold_callback('S Min')) # S: 0-255
+cv2.createTrackbar('V Min', window_name, DEFAULT_THRESHOLDS['V Min'], 255, make_threshold_callback('V Min')) # V: 0-255
+cv2.createTrackbar('H Max', window_name, DEFAULT_THRESHOLDS['H Max'], 179, make_threshold_callback('H Max'))
+cv2.createTrackbar('S Max', window_name, DEFAULT_THRESHOLDS['S Max'], 255, make_threshold_callback('S Max'))
+cv2.createTrackbar('V Max', window_name, DEFAULT_THRESHOLDS['V Max'], 255, make_threshold_callback('V Max'))
+# createTrackbar不会触发回调，且超出滑块范围的初始值会被截断（如H Max的180变为179），以滑块实际位置为准
+for name in threshold_values:
+    threshold_values[name] = cv2.getTrackbarPos(name, window_name)
 
 def load_thresholds():
     """加载保存的阈值配置"""
-    config_file = os.path.join(config_dir, f"hsv_thresholds_{COLOR_NAME}.json")
     try:
         if os.path.exists(config_file):
             with open(config_file, 'r') as f:
@@ -87,16 +115,26 @@ def load_thresholds():
 # 尝试加载保存的阈值配置
 load_thresholds()
 
+# 连续快速保存时各写线程依次进行，先写临时文件再整体替换，配置文件不会出现写了一半的内容
+config_write_lock = threading.Lock()
+
+def write_config_file(payload):
+    """把序列化好的阈值配置写入临时文件后替换配置文件（在后台线程中运行）"""
+    try:
+        with config_write_lock:
+            tmp_file = config_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_file, config_file)
+
+        print(f"{COLOR_DISPLAY_NAME}阈值配置已保存到: {config_file}")
+    except Exception as e:
+
+        print(f"错误: 保存失败 - {e}")
+
 def save_thresholds():
     """保存当前阈值配置"""
-    thresholds = {
-        'H Min': cv2.getTrackbarPos('H Min', window_name),
-        'S Min': cv2.getTrackbarPos('S Min', window_name),
-        'V Min': cv2.getTrackbarPos('V Min', window_name),
-        'H Max': cv2.getTrackbarPos('H Max', window_name),
-        'S Max': cv2.getTrackbarPos('S Max', window_name),
-        'V Max': cv2.getTrackbarPos('V Max', window_name)
-    }
+    thresholds = threshold_values
     
     # 转换为配置文件格式
     config_data = {
@@ -106,52 +144,18 @@ def save_thresholds():
         }
     }
     
-    # 保存到文件
-    output_file = os.path.join(config_dir, f"hsv_thresholds_{COLOR_NAME}.json")
-    try:
-        with open(output_file, 'w') as f:
-            json.dump(config_data, f, indent=2)
-
-        print(f"{COLOR_DISPLAY_NAME}阈值配置已保存到: {output_file}")
-    except Exception as e:
-
-        print(f"错误: 保存失败 - {e}")
-    """加载保存的阈值配置"""
-    config_file = os.path.join(config_dir, f"hsv_thresholds_{COLOR_NAME}.json")
-    try:
-        if os.path.exists(config_file):
-            with open(config_file, 'r') as f:
-                config_data = json.load(f)
-            
-            if COLOR_NAME in config_data:
-                lower = config_data[COLOR_NAME]['lower']
-                upper = config_data[COLOR_NAME]['upper']
-                
-                # 设置轨迹栏位置
-                cv2.setTrackbarPos('H Min', window_name, lower[0])
-                cv2.setTrackbarPos('S Min', window_name, lower[1])
-                cv2.setTrackbarPos('V Min', window_name, lower[2])
-                cv2.setTrackbarPos('H Max', window_name, upper[0])
-                cv2.setTrackbarPos('S Max', window_name, upper[1])
-                cv2.setTrackbarPos('V Max', window_name, upper[2])
-                
-        
-                print(f"已加载{COLOR_DISPLAY_NAME}保存的阈值配置")
-                return True
-
-    except Exception as e:
-
-        print(f"错误: 加载失败 - {e}")
-    return False
+    # 在主线程中完成序列化，写文件放到后台线程，避免磁盘I/O卡住画面刷新（非守护线程，退出前会等写完）
+    payload = json.dumps(config_data, indent=2).encode('utf-8')
+    threading.Thread(target=write_config_file, args=(payload,)).start()
 
 def print_current_thresholds():
     """打印当前阈值"""
-    h_min = cv2.getTrackbarPos('H Min', window_name)
-    s_min = cv2.getTrackbarPos('S Min', window_name)
-    v_min = cv2.getTrackbarPos('V Min', window_name)
-    h_max = cv2.getTrackbarPos('H Max', window_name)
-    s_max = cv2.getTrackbarPos('S Max', window_name)
-    v_max = cv2.getTrackbarPos('V Max', window_name)
+    h_min = threshold_values['H Min']
+    s_min = threshold_values['S Min']
+    v_min = threshold_values['V Min']
+    h_max = threshold_values['H Max']
+    s_max = threshold_values['S Max']
+    v_max = threshold_values['V Max']
     
     print(f"当前{COLOR_DISPLAY_NAME}HSV阈值设置:")
     print(f"Lower: [{h_min}, {s_min}, {v_min}]")
@@ -166,16 +170,87 @@ print("- 黑色识别提示: 主要调整V Max(亮度上限)，降低此值可
 print("- 按 's' 键保存当前阈值配置")
 print("- 按 'p' 键打印当前阈值设置")
 print("- 按 'r' 键恢复默认阈值")
+print("- 按 'f' 键切换快速模式(半分辨率处理)")
 print("- 按 'q' 键退出")
 
 # 性能监控变量
 fps_start_time = time.time()
 fps_count = 0
 current_fps = 0
+info_text = f"FPS: {current_fps:.1f} | {COLOR_DISPLAY_NAME}"
 
 # 比赛场景优化参数
 ENABLE_MORPHOLOGY = True  # 启用形态学操作进行去噪
 BLACK_DETECTION_MODE = True  # 针对黑色检测的特殊优化
+# 启用OpenCL（T-API）：阈值和形态学处理链在GPU/核显上执行，设备不支持时自动回退CPU
+USE_OPENCL = False
+if USE_OPENCL and not cv2.ocl.haveOpenCL():
+    print("当前OpenCV不支持OpenCL，使用CPU处理")
+    USE_OPENCL = False
+# 快速模式：先用pyrDown把画面缩小到1/2再做阈值和形态学，像素量减为1/4，掩码再放大回原尺寸显示（按f键切换）
+fast_mode = False
+# 滑块空闲超过ACTIVE_SECONDS秒后，每帧等待按键IDLE_WAIT_MS毫秒，预览降到约10FPS以节省CPU；拖动滑块时恢复全速
+ACTIVE_SECONDS = 1.0
+IDLE_WAIT_MS = 100
+last_change_time = time.time()
+# 结果窗口是否已创建：创建后若被用户关闭，就不再计算和显示结果图像
+result_window_created = False
+# 形态学内核只生成一次：黑色检测模式使用更小的2x2内核以保留核心球的细节，其余形态学操作使用3x3内核
+MORPH_KERNEL_SMALL = np.ones((2, 2), np.uint8)
+MORPH_KERNEL = np.ones((3, 3), np.uint8)
+
+# 阈值上下限数组只分配一次，滑块值变化时才原地更新
+lower_bound = np.zeros(3, dtype=np.uint8)
+upper_bound = np.zeros(3, dtype=np.uint8)
+
+# 预分配每帧的输出缓冲区，通过dst=复用，避免每帧分配整帧大小的图像
+# 摄像头实际分辨率与设置不符时OpenCV会按需重新分配，这里接住返回值即可
+# 掩码窗口按半分辨率显示，最近邻缩放保持二值边缘清晰，也减少界面刷新的数据量
+MASK_DISPLAY_SIZE = ((VIDEO_WIDTH + 1) // 2, (VIDEO_HEIGHT + 1) // 2)
+if USE_OPENCL:
+    # OpenCL模式下掩码相关的缓冲区放在设备端，中间结果不回传主机内存
+    hsv = cv2.UMat(VIDEO_HEIGHT, VIDEO_WIDTH, cv2.CV_8UC3)
+    mask = cv2.UMat(VIDEO_HEIGHT, VIDEO_WIDTH, cv2.CV_8UC1)
+    mask_tmp = cv2.UMat(VIDEO_HEIGHT, VIDEO_WIDTH, cv2.CV_8UC1)
+    bgr_planes = [cv2.UMat(VIDEO_HEIGHT, VIDEO_WIDTH, cv2.CV_8UC1) for _ in range(3)]
+    value = cv2.UMat(VIDEO_HEIGHT, VIDEO_WIDTH, cv2.CV_8UC1)
+    mask_full = cv2.UMat(VIDEO_HEIGHT, VIDEO_WIDTH, cv2.CV_8UC1)
+    mask_display = cv2.UMat(MASK_DISPLAY_SIZE[1], MASK_DISPLAY_SIZE[0], cv2.CV_8UC1)
+else:
+    hsv = np.empty((VIDEO_HEIGHT, VIDEO_WIDTH, 3), dtype=np.uint8)
+    mask = np.empty((VIDEO_HEIGHT, VIDEO_WIDTH), dtype=np.uint8)
+    mask_tmp = np.empty_like(mask)
+    result = np.empty_like(hsv)
+    # 只按亮度阈值时使用的B、G、R单通道和V通道缓冲区
+    bgr_planes = [np.empty_like(mask) for _ in range(3)]
+    value = np.empty_like(mask)
+    # 快速模式下放大回原尺寸的掩码
+    mask_full = np.empty_like(mask)
+    mask_display = np.empty((MASK_DISPLAY_SIZE[1], MASK_DISPLAY_SIZE[0]), dtype=np.uint8)
+# 快速模式下缩小后的画面（pyrDown输出尺寸为向上取整的一半），缩小在主机端完成，OpenCL模式下只上传缩小后的画面
+small_frame = np.empty(((VIDEO_HEIGHT + 1) // 2, (VIDEO_WIDTH + 1) // 2, 3), dtype=np.uint8)
+
+# 摄像头读取放到后台线程，与阈值处理和窗口刷新并行
+# 只保留最新一帧：处理跟不上时旧帧直接被覆盖，画面不会越来越滞后
+latest_frame = None
+frame_lock = threading.Lock()
+frame_ready = threading.Event()
+capture_running = True
+
+def capture_loop():
+    """后台读取摄像头帧，新帧覆盖尚未处理的旧帧"""
+    global latest_frame
+    while capture_running:
+        ret, captured = cap.read()
+        if not ret:
+            time.sleep(0.1)  # 短暂休眠后重试
+            continue
+        with frame_lock:
+            latest_frame = captured
+            frame_ready.set()
+
+capture_thread = threading.Thread(target=capture_loop, daemon=True)
+capture_thread.start()
 
 while True:
     try:
@@ -186,80 +261,121 @@ while True:
             current_fps = fps_count / (current_time - fps_start_time)
             fps_start_time = current_time
             fps_count = 0
+            info_text = f"FPS: {current_fps:.1f} | {COLOR_DISPLAY_NAME}"
     
         
-        # 获取帧
-        ret, frame = cap.read()
-        if not ret:
-    
-            time.sleep(0.1)  # 短暂休眠后重试
+        # 获取采集线程的最新帧，暂无新帧时等待；摄像头卡顿时也处理窗口事件，保证能按q退出
+        if not frame_ready.wait(0.1):
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
             continue
+        with frame_lock:
+            frame = latest_frame
+            latest_frame = None
+            frame_ready.clear()
 
-        # 转换为HSV颜色空间，比RGB更易区分颜色
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        # 滑块有变化时才更新阈值范围，否则沿用上次的阈值范围
+        if thresholds_dirty:
+            thresholds_dirty = False
+            last_change_time = time.time()
+            h_min = threshold_values['H Min']
+            s_min = threshold_values['S Min']
+            v_min = threshold_values['V Min']
+            h_max = threshold_values['H Max']
+            s_max = threshold_values['S Max']
+            v_max = threshold_values['V Max']
 
-        # 从轨迹栏获取当前阈值
-        h_min = cv2.getTrackbarPos('H Min', window_name)
-        s_min = cv2.getTrackbarPos('S Min', window_name)
-        v_min = cv2.getTrackbarPos('V Min', window_name)
-        h_max = cv2.getTrackbarPos('H Max', window_name)
-        s_max = cv2.getTrackbarPos('S Max', window_name)
-        v_max = cv2.getTrackbarPos('V Max', window_name)
+            # 定义阈值范围
+            lower_bound[0], lower_bound[1], lower_bound[2] = h_min, s_min, v_min
+            upper_bound[0], upper_bound[1], upper_bound[2] = h_max, s_max, v_max
+            threshold_text = f"HSV范围: [{h_min},{s_min},{v_min}] to [{h_max},{s_max},{v_max}]"
 
-        # 定义阈值范围
-        lower_bound = np.array([h_min, s_min, v_min])
-        upper_bound = np.array([h_max, s_max, v_max])
+            # H、S都取满范围时（黑色默认配置），掩码只由亮度V决定
+            value_only = h_min == 0 and h_max >= 179 and s_min == 0 and s_max >= 255
+
+        # 快速模式下阈值和形态学在缩小后的画面上进行，切换模式时缓冲区由OpenCV按新尺寸重新分配
+        proc_frame = cv2.pyrDown(frame, dst=small_frame) if fast_mode else frame
+        # OpenCL模式下上传一次帧数据，后续运算都作用在UMat上
+        src = cv2.UMat(proc_frame) if USE_OPENCL else proc_frame
 
         # 根据阈值创建掩膜，在范围内的变为白色，不在的变为黑色
-        mask = cv2.inRange(hsv, lower_bound, upper_bound)
+        if value_only:
+            # 8位图像的V就是B、G、R三者的最大值，直接由BGR求出再做单通道阈值，省去整帧HSV转换
+            bgr_planes = cv2.split(src, bgr_planes)
+            value = cv2.max(bgr_planes[0], bgr_planes[1], dst=value)
+            value = cv2.max(value, bgr_planes[2], dst=value)
+            mask = cv2.inRange(value, v_min, v_max, dst=mask)
+        else:
+            # 转换为HSV颜色空间，比RGB更易区分颜色
+            hsv = cv2.cvtColor(src, cv2.COLOR_BGR2HSV, dst=hsv)
+            mask = cv2.inRange(hsv, lower_bound, upper_bound, dst=mask)
         
         # 应用形态学操作减少噪声 - 针对黑色球检测优化
         if ENABLE_MORPHOLOGY:
             if BLACK_DETECTION_MODE:
                 # 黑色小球检测的特殊形态学处理
-                # 使用更小的内核以保留核心球的细节
-                kernel_small = np.ones((2, 2), np.uint8)
                 # 先腐蚀去除小的噪声点
-                mask = cv2.erode(mask, kernel_small, iterations=1)
+                mask_tmp = cv2.erode(mask, MORPH_KERNEL_SMALL, dst=mask_tmp, iterations=1)
                 # 再膨胀保留小球轮廓
-                mask = cv2.dilate(mask, kernel_small, iterations=2)
+                mask = cv2.dilate(mask_tmp, MORPH_KERNEL_SMALL, dst=mask, iterations=2)
                 
                 # 使用开运算进一步优化
-                kernel = np.ones((3, 3), np.uint8)
-                mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+                mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, MORPH_KERNEL, dst=mask)
             else:
                 # 标准形态学操作
-                kernel = np.ones((3, 3), np.uint8)
-                mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-                mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+                mask_tmp = cv2.morphologyEx(mask, cv2.MORPH_OPEN, MORPH_KERNEL, dst=mask_tmp)
+                mask = cv2.morphologyEx(mask_tmp, cv2.MORPH_CLOSE, MORPH_KERNEL, dst=mask)
         else:
             # 简单的腐蚀膨胀操作
-            kernel = np.ones((3, 3), np.uint8)
-            mask = cv2.erode(mask, kernel, iterations=1)
-            mask = cv2.dilate(mask, kernel, iterations=1)
+            mask_tmp = cv2.erode(mask, MORPH_KERNEL, dst=mask_tmp, iterations=1)
+            mask = cv2.dilate(mask_tmp, MORPH_KERNEL, dst=mask, iterations=1)
 
-        # 创建结果图像（可视化阈值效果）
-        result = cv2.bitwise_and(frame, frame, mask=mask)
+        # 创建结果图像（可视化阈值效果），结果窗口被关闭时跳过（界面后端不支持该属性时返回-1，照常显示）
+        show_result = (not result_window_created or
+                       cv2.getWindowProperty('检测结果', cv2.WND_PROP_VISIBLE) != 0)
+        if show_result:
+            # 快速模式下用最近邻把掩码放大回原图尺寸，保持二值边缘，结果仍按原分辨率显示
+            if fast_mode:
+                mask_full = cv2.resize(mask, (frame.shape[1], frame.shape[0]), dst=mask_full,
+                                       interpolation=cv2.INTER_NEAREST)
+                result_mask = mask_full
+            else:
+                result_mask = mask
+            # 按掩码直接拷贝像素，不必逐像素做与运算，imshow可直接显示UMat
+            if USE_OPENCL:
+                # 不传dst时OpenCV新建的输出会先清零
+                result = cv2.copyTo(frame, result_mask)
+            else:
+                # 带掩码拷贝不会改写掩码外的像素，复用缓冲区时需先清零
+                result.fill(0)
+                result = cv2.copyTo(frame, result_mask, result)
 
-        # 在原图上显示当前配置信息和FPS
-        info_text = f"FPS: {current_fps:.1f} | {COLOR_DISPLAY_NAME}"
-        
-        # 在图像上显示信息
+        # 在原图上显示当前配置信息和FPS（文字只在FPS或阈值变化时重新生成）
         cv2.putText(frame, info_text, (10, 30), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         
         # 在图像底部显示HSV阈值范围
-        threshold_text = f"HSV范围: [{h_min},{s_min},{v_min}] to [{h_max},{s_max},{v_max}]"
         cv2.putText(frame, threshold_text, (10, frame.shape[0] - 20), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 1)
         
         # 将原图、掩膜和结果显示出来
         cv2.imshow('比赛现场视频', frame)
-        cv2.imshow('颜色掩码', mask)
-        cv2.imshow('检测结果', result)
+        if (proc_frame.shape[1], proc_frame.shape[0]) == MASK_DISPLAY_SIZE:
+            # 快速模式下掩码已是显示尺寸，无需缩放
+            cv2.imshow('颜色掩码', mask)
+        else:
+            mask_display = cv2.resize(mask, MASK_DISPLAY_SIZE, dst=mask_display, interpolation=cv2.INTER_NEAREST)
+            cv2.imshow('颜色掩码', mask_display)
+        if show_result:
+            cv2.imshow('检测结果', result)
+            result_window_created = True
 
-        # 处理按键
-        key = cv2.waitKey(1) & 0xFF
+        # 处理按键（waitKey期间拖动滑块会触发回调，下一帧即按新阈值处理）
+        idle = time.time() - last_change_time > ACTIVE_SECONDS
+        key = cv2.waitKey(IDLE_WAIT_MS if idle else 1) & 0xFF
+        # 阈值调整窗口被关闭后无法再接收按键，直接退出（不支持该属性的界面后端返回-1，不能当作已关闭）
+        if cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE) == 0:
+            break
         if key == ord('q'):
     
             break
@@ -279,6 +395,10 @@ while True:
             cv2.setTrackbarPos('V Max', window_name, DEFAULT_THRESHOLDS['V Max'])
     
             print(f"已恢复{COLOR_DISPLAY_NAME}默认阈值")
+        elif key == ord('f'):
+            # 切换快速模式
+            fast_mode = not fast_mode
+            print(f"快速模式已{'开启' if fast_mode else '关闭'}")
         elif key == ord('b'):
             # 切换黑色检测模式
             BLACK_DETECTION_MODE = not BLACK_DETECTION_MODE
@@ -293,6 +413,8 @@ while True:
         continue
 
 # 清理资源
+capture_running = False
+capture_thread.join(timeout=1.0)
 try:
     if cap is not None:
         cap.release()